@@ -1,6 +1,6 @@
 {
     "name": "Argentina - VAT Computation Date",
-    "version": "18.0.2.1.0",
+    "version": "18.0.2.2.0",
     "category": "Accounting/Localizations",
     "summary": "Compute VAT credit in a different period than accounting date",
     "author": "Vikingo Software",
@@ -11,10 +11,19 @@
         "l10n_ar_account_reports",
     ],
     "data": [
+        "security/ir.model.access.csv",
+        "security/l10n_ar_vat_computation_date_security.xml",
+        "data/ir_cron.xml",
         "views/account_move_views.xml",
         "views/account_ar_vat_line_views.xml",
         "views/res_config_settings_views.xml",
+        "views/l10n_ar_vat_book_snapshot_views.xml",
+        "views/l10n_ar_vat_book_export_views.xml",
+        "views/l10n_ar_vat_deferred_summary_views.xml",
+        "views/l10n_ar_afip_received_import_views.xml",
     ],
+    "pre_init_hook": "pre_init_hook",
+    "post_init_hook": "post_init_hook",
     "installable": True,
     "auto_install": False,
 }
@@ -0,0 +1,267 @@
+import json
+import logging
+
+from odoo.tools import SQL
+from odoo.tools.sql import column_exists, create_column
+
+_logger = logging.getLogger(__name__)
+
+BACKFILL_STATE_KEY = "l10n_ar_vat_computation_date.backfill_state"
+BACKFILL_CHUNK_SIZE = 50000
+
+
+def _get_backfill_state(cr):
+    """Return the state of the last backfill run.
+
+    :return: dict with the last processed ``last_id``, the ``lock_dates``
+        signature the moves were computed with and the time the run was
+        ``started_at``
+    """
+    cr.execute(
+        "SELECT value FROM ir_config_parameter WHERE key = %s",
+        [BACKFILL_STATE_KEY],
+    )
+    row = cr.fetchone()
+    return json.loads(row[0]) if row else {"last_id": 0}
+
+
+def _set_backfill_state(cr, state):
+    cr.execute(
+        """
+        INSERT INTO ir_config_parameter
+            (key, value, create_uid, create_date, write_uid, write_date)
+        VALUES (%s, %s, 1, now() AT TIME ZONE 'UTC', 1, now() AT TIME ZONE 'UTC')
+        ON CONFLICT (key) DO UPDATE SET
+            value = EXCLUDED.value,
+            write_date = EXCLUDED.write_date
+        """,
+        [BACKFILL_STATE_KEY, json.dumps(state)],
+    )
+
+
+def _get_lock_dates_signature(cr):
+    """Return the lock dates of every company the computation depends on."""
+    cr.execute(
+        """
+        SELECT COALESCE(
+            string_agg(
+                format(
+                    '%s:%s:%s:%s:%s',
+                    id,
+                    fiscalyear_lock_date,
+                    tax_lock_date,
+                    hard_lock_date,
+                    purchase_lock_date
+                ),
+                ',' ORDER BY id
+            ),
+            ''
+        )
+        FROM res_company
+        """
+    )
+    return cr.fetchone()[0]
+
+
+def _ensure_backfill_columns(cr):
+    """Create the stored computed columns so the ORM does not fill them itself.
+
+    When a column is created here the backfill state is reset, as the
+    values of a previous run were dropped together with the column.
+    """
+    created = False
+    for column, column_type in (
+        ("l10n_ar_vat_computation_date", "date"),
+        ("l10n_ar_is_vat_adjustment", "boolean"),
+        ("l10n_ar_is_purchase_move", "boolean"),
+        ("l10n_ar_vat_deferral_date", "date"),
+    ):
+        if not column_exists(cr, "account_move", column):
+            create_column(cr, "account_move", column, column_type)
+            created = True
+    if created:
+        _set_backfill_state(cr, {"last_id": 0})
+
+
+def backfill_vat_computation_date(cr, chunk_size=BACKFILL_CHUNK_SIZE, commit=False):
+    """Fill the stored fields of this module on account_move with plain SQL.
+
+    The values are computed by ``id`` chunks and the last processed ``id`` is
+    kept in ``ir_config_parameter``, so an interrupted run resumes where it
+    stopped. The lock dates of the companies are kept with it: when they have
+    changed since, the values already computed are stale and the backfill
+    starts over. Otherwise the moves already processed but modified since the
+    previous run started are computed again. With ``commit=True`` every chunk
+    is committed on its own; this is meant to be run from a shell ahead of the
+    installation or upgrade::
+
+        from odoo.addons.l10n_ar_vat_computation_date.hooks import (
+            backfill_vat_computation_date,
+        )
+        backfill_vat_computation_date(env.cr, commit=True)
+
+    The computation date mirrors ``_compute_l10n_ar_vat_computation_date``:
+    AR purchase invoices dated on or before the most restrictive company lock
+    date are moved one month after it. User specific lock date exceptions are
+    not taken into account. The VAT deferral period is only set on posted
+    invoices that were actually deferred, i.e. that have an adjustment entry
+    or VAT on the VAT Credit To Compute Account: it is the date of their
+    adjustment entry, or their computation date when they have none.
+    """
+    _ensure_backfill_columns(cr)
+    if commit:
+        cr.commit()
+
+    cr.execute("SELECT COALESCE(MAX(id), 0) FROM account_move")
+    max_id = cr.fetchone()[0]
+    state = _get_backfill_state(cr)
+    lock_dates = _get_lock_dates_signature(cr)
+    if state.get("lock_dates") != lock_dates:
+        state = {"last_id": 0}
+    last_id = state["last_id"]
+    resumed_from = last_id
+    previous_start = state.get("started_at")
+    if not last_id:
+        cr.execute("SELECT now() AT TIME ZONE 'UTC'")
+        state = {
+            "last_id": 0,
+            "lock_dates": lock_dates,
+            "started_at": cr.fetchone()[0].isoformat(),
+        }
+
+    # The source invoice links only exist once the module has been installed;
+    # netted adjustments are only referenced by their source invoices
+    if column_exists(cr, "account_move", "l10n_ar_vat_source_invoice_id"):
+        is_adjustment = SQL(
+            """(
+                m.l10n_ar_vat_source_invoice_id IS NOT NULL
+                OR EXISTS (
+                    SELECT 1
+                      FROM account_move s
+                     WHERE s.l10n_ar_vat_adjustment_move_id = m.id
+                )
+            )"""
+        )
+        adjustment_date = SQL(
+            """(
+                SELECT a.date
+                  FROM account_move a
+                 WHERE a.id = m.l10n_ar_vat_adjustment_move_id
+            )"""
+        )
+        has_adjustment = SQL("m.l10n_ar_vat_adjustment_move_id IS NOT NULL")
+    else:
+        is_adjustment = SQL("FALSE")
+        adjustment_date = SQL("NULL::date")
+        has_adjustment = SQL("FALSE")
+    if column_exists(cr, "res_company", "l10n_ar_vat_credit_to_compute_account_id"):
+        has_deferred_vat = SQL(
+            """EXISTS (
+                SELECT 1
+                  FROM account_move_line l
+                 WHERE l.move_id = m.id
+                   AND l.account_id = c.l10n_ar_vat_credit_to_compute_account_id
+            )"""
+        )
+    else:
+        has_deferred_vat = SQL("FALSE")
+
+    lock_date = SQL(
+        """GREATEST(
+            c.fiscalyear_lock_date,
+            c.tax_lock_date,
+            c.hard_lock_date,
+            CASE WHEN j.type = 'purchase' THEN c.purchase_lock_date END
+        )"""
+    )
+
+    def update_moves(moves):
+        cr.execute(
+            SQL(
+                """
+                UPDATE account_move m
+                   SET l10n_ar_is_purchase_move = (
+                           m.move_type IN ('in_invoice', 'in_refund')
+                           AND country.code IS NOT DISTINCT FROM 'AR'
+                       ),
+                       l10n_ar_vat_computation_date = CASE
+                           WHEN m.move_type NOT IN ('in_invoice', 'in_refund')
+                                OR country.code IS DISTINCT FROM 'AR'
+                                OR m.date IS NULL
+                           THEN NULL
+                           WHEN m.date <= %(lock_date)s
+                           THEN (%(lock_date)s + INTERVAL '1 month')::date
+                           ELSE m.date
+                       END,
+                       l10n_ar_vat_deferral_date = CASE
+                           WHEN m.state = 'posted'
+                                AND m.move_type IN ('in_invoice', 'in_refund')
+                                AND country.code IS NOT DISTINCT FROM 'AR'
+                                AND (%(has_adjustment)s OR %(has_deferred_vat)s)
+                           THEN COALESCE(
+                               %(adjustment_date)s,
+                               CASE
+                                   WHEN m.date <= %(lock_date)s
+                                   THEN (%(lock_date)s + INTERVAL '1 month')::date
+                                   ELSE m.date
+                               END
+                           )
+                       END,
+                       l10n_ar_is_vat_adjustment = %(is_adjustment)s
+                  FROM res_company c
+             LEFT JOIN res_country country
+                    ON country.id = c.account_fiscal_country_id,
+                       account_journal j
+                 WHERE c.id = m.company_id
+                   AND j.id = m.journal_id
+                   AND %(moves)s
+                """,
+                lock_date=lock_date,
+                is_adjustment=is_adjustment,
+                adjustment_date=adjustment_date,
+                has_adjustment=has_adjustment,
+                has_deferred_vat=has_deferred_vat,
+                moves=moves,
+            )
+        )
+
+    if resumed_from and previous_start:
+        # Moves processed by the previous run may have been modified since
+        cr.execute("SELECT now() AT TIME ZONE 'UTC'")
+        state["started_at"] = cr.fetchone()[0].isoformat()
+        update_moves(
+            SQL(
+                "m.id <= %s AND m.write_date >= %s", resumed_from, previous_start
+            )
+        )
+        _set_backfill_state(cr, state)
+        if commit:
+            cr.commit()
+
+    while last_id < max_id:
+        upper_id = last_id + chunk_size
+        update_moves(SQL("m.id > %s AND m.id <= %s", last_id, upper_id))
+        last_id = min(upper_id, max_id)
+        state["last_id"] = last_id
+        _set_backfill_state(cr, state)
+        if commit:
+            cr.commit()
+        _logger.info(
+            "VAT computation date backfill: %s/%s account moves processed",
+            last_id,
+            max_id,
+        )
+
+
+def pre_init_hook(env):
+    """Backfill the stored fields with SQL instead of the ORM on install.
+
+    Any part already processed by a previous run of
+    ``backfill_vat_computation_date`` is skipped.
+    """
+    backfill_vat_computation_date(env.cr)
+
+
+def post_init_hook(env):
+    """Build the deferred VAT summary from the existing invoices."""
+    env["l10n_ar.vat.deferred.summary"]._rebuild()
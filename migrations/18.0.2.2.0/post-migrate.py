@@ -0,0 +1,7 @@
+from odoo import SUPERUSER_ID, api
+
+
+def migrate(cr, version):
+    """Key the deferred VAT summary on the VAT deferral period."""
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env["l10n_ar.vat.deferred.summary"]._rebuild()
@@ -0,0 +1,12 @@
+from odoo.addons.l10n_ar_vat_computation_date.hooks import (
+    backfill_vat_computation_date,
+)
+
+
+def migrate(cr, version):
+    """Fill the new stored columns of account_move with SQL before the ORM.
+
+    The ORM would otherwise compute them for every move in a single
+    transaction when the module is updated.
+    """
+    backfill_vat_computation_date(cr)
@@ -2,3 +2,7 @@ from . import account_move
 from . import account_move_line
 from . import res_company
 from . import res_config_settings
+from . import l10n_ar_vat_book_snapshot
+from . import l10n_ar_vat_book_export
+from . import l10n_ar_vat_deferred_summary
+from . import l10n_ar_afip_received_import
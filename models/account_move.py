@@ -1,7 +1,15 @@
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
 from dateutil.relativedelta import relativedelta
 
-from odoo import _, api, fields, models
+from odoo import Command, _, api, fields, models
 from odoo.exceptions import UserError
+from odoo.tools.sql import create_index
+
+_logger = logging.getLogger(__name__)
 
 
 class AccountMove(models.Model):
@@ -18,6 +26,15 @@ class AccountMove(models.Model):
         readonly=True,
     )
 
+    l10n_ar_vat_deferral_date = fields.Date(
+        string="VAT Deferral Period",
+        help="VAT computation date in force when the invoice was posted with "
+        "deferred VAT. The deferred VAT summary is kept on this date, which does "
+        "not follow later lock date changes.",
+        copy=False,
+        readonly=True,
+    )
+
     l10n_ar_vat_adjustment_move_id = fields.Many2one(
         "account.move",
         string="VAT Adjustment Entry",
@@ -37,6 +54,14 @@ class AccountMove(models.Model):
         index=True,
     )
 
+    l10n_ar_vat_source_invoice_ids = fields.One2many(
+        "account.move",
+        "l10n_ar_vat_adjustment_move_id",
+        string="Source Invoices",
+        help="Purchase invoices whose deferred VAT is adjusted by this entry",
+        readonly=True,
+    )
+
     l10n_ar_is_vat_adjustment = fields.Boolean(
         string="Is VAT Adjustment",
         compute="_compute_l10n_ar_is_vat_adjustment",
@@ -44,23 +69,66 @@ class AccountMove(models.Model):
         help="Indicates if this entry is a VAT credit adjustment",
     )
 
-    @api.depends("l10n_ar_vat_source_invoice_id")
+    l10n_ar_is_purchase_move = fields.Boolean(
+        string="Is AR Purchase Invoice",
+        compute="_compute_l10n_ar_is_purchase_move",
+        store=True,
+        help="Indicates if this is an Argentine vendor bill or refund",
+    )
+
+    def init(self):
+        super().init()
+        # Serves the per company and period scans over AR purchase invoices
+        create_index(
+            self.env.cr,
+            "account_move_l10n_ar_purchase_company_date_idx",
+            self._table,
+            ["company_id", "date"],
+            where="l10n_ar_is_purchase_move",
+        )
+        # Serves the VAT line view filtered on the VAT computation date
+        create_index(
+            self.env.cr,
+            "account_move_l10n_ar_vat_computation_date_idx",
+            self._table,
+            ["COALESCE(l10n_ar_vat_computation_date, date)"],
+        )
+
+    @api.depends("l10n_ar_vat_source_invoice_id", "l10n_ar_vat_source_invoice_ids")
     def _compute_l10n_ar_is_vat_adjustment(self):
         """Mark entries as VAT adjustments if they have a source invoice."""
         for move in self:
-            move.l10n_ar_is_vat_adjustment = bool(move.l10n_ar_vat_source_invoice_id)
+            move.l10n_ar_is_vat_adjustment = bool(
+                move.l10n_ar_vat_source_invoice_id
+                or move.l10n_ar_vat_source_invoice_ids
+            )
+
+    @api.depends("move_type", "country_code")
+    def _compute_l10n_ar_is_purchase_move(self):
+        """Classify Argentine purchase invoices once, at write time."""
+        for move in self:
+            move.l10n_ar_is_purchase_move = (
+                move.move_type in ("in_invoice", "in_refund")
+                and move.country_code == "AR"
+            )
 
     def _is_ar_purchase_move(self):
         """Check if this is an Argentine purchase invoice."""
         self.ensure_one()
-        return (
-            self.move_type in ("in_invoice", "in_refund") and self.country_code == "AR"
-        )
+        return self.l10n_ar_is_purchase_move
+
+    def _l10n_ar_split_purchase_moves(self):
+        """Split the recordset in (AR purchase invoices, other moves).
+
+        The stored flag is prefetched for the whole recordset, so the split
+        costs a single query whatever the batch size.
+        """
+        ar_purchases = self.filtered("l10n_ar_is_purchase_move")
+        return ar_purchases, self - ar_purchases
 
     @api.depends(
         "date",
-        "move_type",
-        "country_code",
+        "l10n_ar_is_purchase_move",
         "company_id.fiscalyear_lock_date",
         "company_id.tax_lock_date",
     )
@@ -70,33 +138,91 @@ class AccountMove(models.Model):
         Uses the most restrictive lock date that affects this purchase invoice
         to determine when the VAT credit should be computed.
         """
+        computation_dates = self._l10n_ar_get_vat_computation_dates()
         for move in self:
-            if (
-                move.move_type not in ("in_invoice", "in_refund")
-                or move.country_code != "AR"
-                or not move.date
-            ):
-                move.l10n_ar_vat_computation_date = False
+            move.l10n_ar_vat_computation_date = computation_dates[move]
+
+    def _l10n_ar_get_vat_computation_dates(self):
+        """Return the VAT computation date of each move, keyed by move.
+
+        Lock dates are resolved once per (company, journal, date) so large
+        batches of invoices of the same period share the lookup.
+        """
+        lock_dates_cache = {}
+        computation_dates = {}
+        for move in self:
+            if not move.l10n_ar_is_purchase_move or not move.date:
+                computation_dates[move] = False
                 continue
 
             # Check all lock dates that could affect this purchase invoice
-            lock_dates = move.company_id._get_violated_lock_dates(
-                move.date,
-                has_tax=True,  # Purchase invoices affect tax reports
-                journal=move.journal_id,
-            )
+            key = (move.company_id, move.journal_id, move.date)
+            if key not in lock_dates_cache:
+                lock_dates_cache[key] = move.company_id._get_violated_lock_dates(
+                    move.date,
+                    has_tax=True,  # Purchase invoices affect tax reports
+                    journal=move.journal_id,
+                )
+            lock_dates = lock_dates_cache[key]
 
             if not lock_dates:
                 # No lock dates violated, use the invoice date
-                move.l10n_ar_vat_computation_date = move.date
+                computation_dates[move] = move.date
             else:
                 # Use the last day of the month following the most restrictive lock date
                 most_restrictive_lock_date = lock_dates[-1][
                     0
                 ]  # Last one is most recent
-                move.l10n_ar_vat_computation_date = (
-                    most_restrictive_lock_date + relativedelta(months=1)
+                computation_dates[move] = most_restrictive_lock_date + relativedelta(
+                    months=1
                 )
+        return computation_dates
+
+    def l10n_ar_vat_simulate_deferral(self):
+        """Project the VAT deferral of vendor bills without posting them.
+
+        Meant for draft invoices: nothing is created nor written. The lock
+        dates are evaluated now, and the VAT amount is the balance of the
+        lines currently on the company's definitive VAT credit account, which
+        is what posting would move to the temporary account.
+
+        :return: one dict per AR purchase invoice of the recordset with the keys
+            ``move_id``, ``deferred``, ``vat_computation_date`` and
+            ``deferred_vat_amount``
+        """
+        ar_purchases, __ = self._l10n_ar_split_purchase_moves()
+        computation_dates = ar_purchases._l10n_ar_get_vat_computation_dates()
+        deferred = ar_purchases.filtered(
+            lambda m: computation_dates[m] and computation_dates[m] != m.date
+        )
+
+        # One grouped query for the VAT of every deferred invoice
+        vat_amounts = {}
+        credit_accounts = deferred.company_id.l10n_ar_vat_credit_account_id
+        if credit_accounts:
+            for move, account, balance in self.env["account.move.line"]._read_group(
+                [
+                    ("move_id", "in", deferred.ids),
+                    ("account_id", "in", credit_accounts.ids),
+                ],
+                ["move_id", "account_id"],
+                ["balance:sum"],
+            ):
+                if account == move.company_id.l10n_ar_vat_credit_account_id:
+                    vat_amounts[move.id] = balance
+
+        deferred_ids = set(deferred.ids)
+        return [
+            {
+                "move_id": move.id,
+                "deferred": move.id in deferred_ids,
+                "vat_computation_date": fields.Date.to_string(
+                    computation_dates[move]
+                ),
+                "deferred_vat_amount": vat_amounts.get(move.id, 0.0),
+            }
+            for move in ar_purchases
+        ]
 
     def _check_fiscal_lock_dates(self):
         """Override to skip check for Argentine purchase invoices.
@@ -107,7 +233,7 @@ class AccountMove(models.Model):
         l10n_ar_vat_computation_date in _check_tax_lock_date on the move lines.
         """
         # Filter out Argentine purchase invoices from the check
-        moves_to_check = self.filtered(lambda m: not m._is_ar_purchase_move())
+        __, moves_to_check = self._l10n_ar_split_purchase_moves()
 
         # Only check non-Argentine purchase invoices
         if moves_to_check:
@@ -148,138 +274,513 @@ class AccountMove(models.Model):
 
     def _post(self, soft=True):
         """Override to replace VAT accounts in invoices posted in locked periods."""
+        # Only companies that opted in pay for the instrumentation
+        timings = [] if self.company_id.filtered("l10n_ar_vat_post_profiling") else None
+
         # Identify AR purchase invoices with deferred VAT computation
-        ar_purchase_deferred = self.filtered(
-            lambda m: m._is_ar_purchase_move()
-            and m.l10n_ar_vat_computation_date
+        ar_purchases, __ = self._l10n_ar_split_purchase_moves()
+        ar_purchase_deferred = ar_purchases.filtered(
+            lambda m: m.l10n_ar_vat_computation_date
             and m.l10n_ar_vat_computation_date != m.date
         )
 
-        # Replace VAT accounts before posting
-        for move in ar_purchase_deferred:
-            company = move.company_id
-
-            # Validate configuration
-            if (
-                not company.l10n_ar_vat_credit_account_id
-                or not company.l10n_ar_vat_credit_to_compute_account_id
-            ):
-                raise UserError(
-                    _(
-                        "Please configure VAT credit accounts for company "
-                        "%(company)s in Accounting > Configuration > Settings > "
-                        "Argentina",
-                        company=company.name,
+        # Replace VAT accounts before posting, with one search and one write
+        # per company whatever the number of invoices and lines
+        with self._l10n_ar_vat_post_stage("vat_account_swap", timings):
+            for company, moves in ar_purchase_deferred.grouped("company_id").items():
+                # Validate configuration
+                if (
+                    not company.l10n_ar_vat_credit_account_id
+                    or not company.l10n_ar_vat_credit_to_compute_account_id
+                ):
+                    raise UserError(
+                        _(
+                            "Please configure VAT credit accounts for company "
+                            "%(company)s in Accounting > Configuration > Settings > "
+                            "Argentina",
+                            company=company.name,
+                        )
                     )
-                )
-
-            # Find and replace VAT credit account lines
-            vat_credit_account = company.l10n_ar_vat_credit_account_id
-            vat_lines = move.line_ids.filtered(
-                lambda line, acc=vat_credit_account: line.account_id == acc
-            )
 
-            if vat_lines:
-                vat_lines.write(
-                    {"account_id": company.l10n_ar_vat_credit_to_compute_account_id.id}
+                # Find and replace VAT credit account lines
+                vat_lines = self.env["account.move.line"].search(
+                    [
+                        ("move_id", "in", moves.ids),
+                        ("account_id", "=", company.l10n_ar_vat_credit_account_id.id),
+                    ]
                 )
 
+                if vat_lines:
+                    vat_lines.write(
+                        {
+                            "account_id": (
+                                company.l10n_ar_vat_credit_to_compute_account_id.id
+                            )
+                        }
+                    )
+
         # Continue with normal posting
-        res = super()._post(soft=soft)
+        with self._l10n_ar_vat_post_stage("post", timings):
+            res = super()._post(soft=soft)
 
         # Create adjustment entries after posting
-        ar_purchase_deferred._create_vat_adjustment_entries()
+        with self._l10n_ar_vat_post_stage("adjustment_entries", timings):
+            for computation_date, moves in ar_purchase_deferred.grouped(
+                "l10n_ar_vat_computation_date"
+            ).items():
+                moves.l10n_ar_vat_deferral_date = computation_date
+            vat_amounts = ar_purchase_deferred._l10n_ar_vat_deferred_amounts()
+            ar_purchase_deferred._l10n_ar_vat_update_summary(vat_amounts, deferred=1)
+            ar_purchase_deferred._create_vat_adjustment_entries(vat_amounts)
+
+        if timings is not None:
+            self._l10n_ar_vat_log_post_timings(timings, ar_purchase_deferred)
 
         return res
 
-    def _create_vat_adjustment_entries(self):
-        """Create adjustment journal entries for deferred VAT credit."""
-        for move in self:
-            company = move.company_id
+    @contextmanager
+    def _l10n_ar_vat_post_stage(self, stage, timings):
+        """Record the duration and query count of one ``_post`` stage.
 
-            # Find the VAT adjustment journal
-            adjustment_journal = self.env["account.journal"].search(
-                [
-                    ("company_id", "=", company.id),
-                    ("type", "=", "general"),
-                    ("code", "=", "AJIVA"),
-                ],
-                limit=1,
+        Does nothing when ``timings`` is None, i.e. when profiling is disabled
+        for every company in the batch.
+        """
+        if timings is None:
+            yield
+            return
+        cr = self.env.cr
+        query_count = cr.sql_log_count
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timings.append(
+                (stage, time.perf_counter() - start, cr.sql_log_count - query_count)
             )
 
-            if not adjustment_journal:
-                raise UserError(
-                    _(
-                        "VAT Adjustment Journal (AJIVA) not found for company "
-                        "%(company)s. Please create it manually.",
-                        company=company.name,
-                    )
-                )
+    def _l10n_ar_vat_log_post_timings(self, timings, deferred_moves):
+        """Emit the structured posting profile and flag slow batches.
+
+        The slow-posting check uses the lowest threshold configured among
+        the profiled companies of the batch.
+        """
+        total_duration = sum(duration for __, duration, __ in timings)
+        total_queries = sum(queries for __, __, queries in timings)
+        _logger.info(
+            "l10n_ar_vat_post_profile batch_size=%s deferred=%s total=%.3fs "
+            "queries=%s %s",
+            len(self),
+            len(deferred_moves),
+            total_duration,
+            total_queries,
+            " ".join(
+                f"{stage}={duration:.3f}s/{queries}q"
+                for stage, duration, queries in timings
+            ),
+        )
+
+        thresholds = [
+            company.l10n_ar_vat_post_slow_threshold
+            for company in self.company_id.filtered("l10n_ar_vat_post_profiling")
+            if company.l10n_ar_vat_post_slow_threshold > 0
+        ]
+        if thresholds and total_duration > min(thresholds):
+            _logger.warning(
+                "l10n_ar_vat_post_slow batch_size=%s total=%.3fs threshold=%.3fs "
+                "move_ids=%s",
+                len(self),
+                total_duration,
+                min(thresholds),
+                self.ids,
+            )
+
+    def _create_vat_adjustment_entries(self, vat_amounts=None):
+        """Create adjustment journal entries for deferred VAT credit.
+
+        For companies netting adjustments, the invoices and refunds sharing a
+        partner and a VAT computation date get a single entry for their net
+        deferred VAT. This includes documents posted earlier whose adjustment
+        is still open: that adjustment is rewritten in place for all the
+        documents. Otherwise each invoice gets its own entry.
+
+        :param vat_amounts: deferred VAT by move id, as returned by
+            _l10n_ar_vat_deferred_amounts, read from the moves if not given
+        """
+        if vat_amounts is None:
+            vat_amounts = self._l10n_ar_vat_deferred_amounts()
+        netted = self.filtered("company_id.l10n_ar_vat_net_adjustments")
+        groups = defaultdict(lambda: self.env["account.move"])
+        for move in self - netted:
+            groups[move.id] |= move
+        for move in netted:
+            groups[move._l10n_ar_vat_netting_key()] |= move
+
+        # Release the open adjustments the new documents are netted with; the
+        # first one of each group is rewritten for the whole group
+        released = self.env["account.move"]
+        reused = {}
+        for source in netted._l10n_ar_vat_get_open_netted_sources():
+            key = source._l10n_ar_vat_netting_key(
+                source.l10n_ar_vat_adjustment_move_id.date
+            )
+            if key in groups:
+                groups[key] |= source
+                released |= source
+                reused.setdefault(key, source.l10n_ar_vat_adjustment_move_id)
+        if released:
+            vat_amounts = {**vat_amounts, **released._l10n_ar_vat_deferred_amounts()}
+            released._l10n_ar_vat_update_summary(vat_amounts, settled=-1)
+            adjustments = released.l10n_ar_vat_adjustment_move_id
+            released.l10n_ar_vat_adjustment_move_id = False
+            extra_adjustments = adjustments - self.env["account.move"].union(
+                *reused.values()
+            )
+            if extra_adjustments:
+                extra_adjustments.button_cancel()
+
+        journals = {}
+        for key, sources in groups.items():
+            company = sources.company_id
+            if company not in journals:
+                journals[company] = self._l10n_ar_vat_get_adjustment_journal(company)
+            sources._l10n_ar_vat_create_adjustment(
+                journals[company], vat_amounts, reused.get(key)
+            )
 
-            # Calculate total VAT amount deferred
-            vat_to_compute_account = company.l10n_ar_vat_credit_to_compute_account_id
-            vat_debit = sum(
-                move.line_ids.filtered(
-                    lambda line, acc=vat_to_compute_account: line.account_id == acc
-                ).mapped("debit")
+    def _l10n_ar_vat_netting_key(self, computation_date=None):
+        """Return the key grouping documents in a single netted adjustment."""
+        self.ensure_one()
+        return (
+            self.company_id.id,
+            self.commercial_partner_id.id,
+            computation_date or self.l10n_ar_vat_computation_date,
+        )
+
+    def _l10n_ar_vat_get_open_netted_sources(self):
+        """Return posted documents whose open adjustment the moves can join.
+
+        Those are the other documents of the same companies and partners whose
+        adjustment is posted on one of the VAT computation dates of the moves,
+        in a period not covered by a lock date. They are read with a single
+        search whatever the size of the batch.
+        """
+        if not self:
+            return self
+        sources = self.search(
+            [
+                ("id", "not in", self.ids),
+                ("state", "=", "posted"),
+                ("company_id", "in", self.company_id.ids),
+                ("commercial_partner_id", "in", self.commercial_partner_id.ids),
+                ("l10n_ar_vat_adjustment_move_id.state", "=", "posted"),
+                (
+                    "l10n_ar_vat_adjustment_move_id.date",
+                    "in",
+                    list(set(self.mapped("l10n_ar_vat_computation_date"))),
+                ),
+            ]
+        )
+        return sources.filtered(
+            lambda m: not m.company_id._get_lock_date_violations(
+                m.l10n_ar_vat_adjustment_move_id.date,
+                fiscalyear=True,
+                sale=False,
+                purchase=False,
+                tax=True,
+                hard=True,
             )
-            vat_credit = sum(
-                move.line_ids.filtered(
-                    lambda line, acc=vat_to_compute_account: line.account_id == acc
-                ).mapped("credit")
+        )
+
+    def _l10n_ar_vat_deferred_amounts(self):
+        """Return the VAT on the temporary account of each move, keyed by id.
+
+        All moves are read in a single grouped query.
+        """
+        to_compute_accounts = self.company_id.l10n_ar_vat_credit_to_compute_account_id
+        if not to_compute_accounts:
+            return {}
+        vat_amounts = {}
+        for move, account, balance in self.env["account.move.line"]._read_group(
+            [
+                ("move_id", "in", self.ids),
+                ("account_id", "in", to_compute_accounts.ids),
+            ],
+            ["move_id", "account_id"],
+            ["balance:sum"],
+        ):
+            if account == move.company_id.l10n_ar_vat_credit_to_compute_account_id:
+                vat_amounts[move.id] = balance
+        return vat_amounts
+
+    def _l10n_ar_vat_update_summary(self, vat_amounts, deferred=0, settled=0):
+        """Apply the deferred VAT of the moves to the monthly summary.
+
+        Amounts are keyed on the VAT deferral period frozen at posting, so
+        releasing an invoice after a lock date change takes them out of the
+        summary line they were added to. Settled amounts only apply to the
+        moves whose posted adjustment is dated up to the settlement date of
+        the summary; the others are settled by its daily cron.
+
+        :param vat_amounts: deferred VAT by move id
+        :param deferred: sign (1, -1 or 0) applied to the deferred amounts
+        :param settled: sign (1, -1 or 0) applied to the settled amounts
+        """
+        summary = self.env["l10n_ar.vat.deferred.summary"]
+        settled_until = summary._get_settled_until()
+
+        def is_settled(move):
+            adjustment = move.l10n_ar_vat_adjustment_move_id
+            return adjustment.state == "posted" and adjustment.date <= settled_until
+
+        summary._add_amounts(
+            (
+                move.company_id.id,
+                move.date,
+                move.l10n_ar_vat_deferral_date,
+                deferred * vat_amounts[move.id],
+                settled * vat_amounts[move.id] if is_settled(move) else 0.0,
             )
-            vat_amount = vat_debit - vat_credit
+            for move in self
+            if vat_amounts.get(move.id) and move.l10n_ar_vat_deferral_date
+        )
 
-            # Skip if no VAT amount
-            if not vat_amount:
-                continue
+    @api.model
+    def _l10n_ar_vat_get_adjustment_journal(self, company):
+        """Return the VAT adjustment journal (AJIVA) of the company."""
+        adjustment_journal = self.env["account.journal"].search(
+            [
+                ("company_id", "=", company.id),
+                ("type", "=", "general"),
+                ("code", "=", "AJIVA"),
+            ],
+            limit=1,
+        )
 
-            # Create the adjustment entry
+        if not adjustment_journal:
+            raise UserError(
+                _(
+                    "VAT Adjustment Journal (AJIVA) not found for company "
+                    "%(company)s. Please create it manually.",
+                    company=company.name,
+                )
+            )
+        return adjustment_journal
+
+    def _l10n_ar_vat_create_adjustment(
+        self, adjustment_journal, vat_amounts, adjustment=None
+    ):
+        """Create and post one adjustment entry for the net VAT of the moves.
+
+        All moves must share the company, partner and VAT computation date.
+
+        :param adjustment: open adjustment entry to rewrite for the moves
+            instead of creating a new one; it is reset to draft, its amounts
+            are updated and it is posted again, or cancelled if the net VAT
+            of the moves is zero
+        """
+        move = self[0]
+        company = move.company_id
+        vat_to_compute_account = company.l10n_ar_vat_credit_to_compute_account_id
+
+        # Calculate total VAT amount deferred
+        vat_amount = company.currency_id.round(
+            sum(vat_amounts.get(source.id, 0.0) for source in self)
+        )
+
+        # Skip if no VAT amount
+        if company.currency_id.is_zero(vat_amount):
+            if adjustment:
+                adjustment.button_cancel()
+            return
+
+        names = ", ".join(self.mapped("name"))
+        debit = max(vat_amount, 0.0)
+        credit = max(-vat_amount, 0.0)
+        line_name = _("VAT credit computation - %(move)s", move=names)
+        lines_vals = {
+            # Debit: IVA Crédito Fiscal (definitive account)
+            company.l10n_ar_vat_credit_account_id: {
+                "partner_id": move.partner_id.id,
+                "debit": debit,
+                "credit": credit,
+                "name": line_name,
+            },
+            # Credit: IVA Crédito Fiscal a Computar (temporary account)
+            vat_to_compute_account: {
+                "partner_id": move.partner_id.id,
+                "debit": credit,
+                "credit": debit,
+                "name": line_name,
+            },
+        }
+        ref = _("VAT Adjustment - %(move)s", move=names)
+
+        if adjustment:
+            # Rewrite the amounts of the open adjustment, which keeps its
+            # number instead of leaving a cancelled entry behind
+            adjustment.button_draft()
+            adjustment.write(
+                {
+                    "ref": ref,
+                    "line_ids": [
+                        Command.update(line.id, lines_vals[line.account_id])
+                        for line in adjustment.line_ids
+                        if line.account_id in lines_vals
+                    ],
+                }
+            )
+            adjustment_move = adjustment
+        else:
             adjustment_move = self.env["account.move"].create(
                 {
                     "move_type": "entry",
                     "date": move.l10n_ar_vat_computation_date,
                     "journal_id": adjustment_journal.id,
-                    "ref": _("VAT Adjustment - %(move)s", move=move.name),
+                    "ref": ref,
                     "line_ids": [
-                        # Debit: IVA Crédito Fiscal (definitive account)
-                        (
-                            0,
-                            0,
-                            {
-                                "account_id": company.l10n_ar_vat_credit_account_id.id,
-                                "partner_id": move.partner_id.id,
-                                "debit": vat_amount,
-                                "credit": 0.0,
-                                "name": _(
-                                    "VAT credit computation - %(move)s", move=move.name
-                                ),
-                            },
-                        ),
-                        # Credit: IVA Crédito Fiscal a Computar (temporary account)
-                        (
-                            0,
-                            0,
-                            {
-                                "account_id": vat_to_compute_account.id,
-                                "partner_id": move.partner_id.id,
-                                "debit": 0.0,
-                                "credit": vat_amount,
-                                "name": _(
-                                    "VAT credit computation - %(move)s", move=move.name
-                                ),
-                            },
-                        ),
+                        Command.create({"account_id": account.id, **vals})
+                        for account, vals in lines_vals.items()
                     ],
                 }
             )
 
-            # Post the adjustment entry
-            adjustment_move.action_post()
+        # Post the adjustment entry
+        adjustment_move.action_post()
+
+        # Create bidirectional relationship; netted entries are traced back
+        # through l10n_ar_vat_source_invoice_ids only
+        adjustment_move.l10n_ar_vat_source_invoice_id = (
+            move.id if len(self) == 1 else False
+        )
+        self.l10n_ar_vat_adjustment_move_id = adjustment_move.id
+        self._l10n_ar_vat_update_summary(vat_amounts, settled=1)
+
+    def button_draft(self):
+        """Override to release the VAT adjustments of deferred invoices."""
+        res = super().button_draft()
+        self._l10n_ar_vat_release_adjustments()
+        return res
+
+    def button_cancel(self):
+        """Override to release the VAT adjustments of cancelled invoices.
+
+        Posted invoices already go through button_draft; this covers draft
+        invoices still linked to an adjustment.
+        """
+        res = super().button_cancel()
+        self._l10n_ar_vat_release_adjustments()
+        return res
+
+    def _l10n_ar_vat_release_adjustments(self):
+        """Undo the VAT deferral of invoices reset to draft or cancelled.
+
+        All operations are done set-wise for the whole batch:
+
+        - adjustments dated in a period covered by a lock date are reversed,
+        - open adjustments shared with posted invoices are rewritten for the
+          VAT of those invoices,
+        - the other adjustments are reset to draft and cancelled, which keeps
+          the AJIVA sequence free of gaps,
+        - the temporary VAT account is replaced back by the definitive one,
+        - the links from the invoices to their adjustments are cleared.
+        """
+        ar_purchases, __ = self._l10n_ar_split_purchase_moves()
+        ar_purchases = ar_purchases.filtered(lambda m: m.state in ("draft", "cancel"))
+        if not ar_purchases:
+            return
+
+        adjustments = ar_purchases.l10n_ar_vat_adjustment_move_id
+        # Posted invoices sharing a netted adjustment with the batch get a
+        # new adjustment for their own VAT once the shared one is released
+        remaining_sources = (
+            adjustments.l10n_ar_vat_source_invoice_ids - ar_purchases
+        ).filtered(lambda m: m.state == "posted")
+
+        # Take the released VAT out of the summary while it is still on the
+        # temporary account
+        vat_amounts = (ar_purchases | remaining_sources)._l10n_ar_vat_deferred_amounts()
+        ar_purchases._l10n_ar_vat_update_summary(vat_amounts, deferred=-1)
+        (
+            ar_purchases.filtered("l10n_ar_vat_adjustment_move_id") | remaining_sources
+        )._l10n_ar_vat_update_summary(vat_amounts, settled=-1)
+
+        locked_adjustments = adjustments.filtered(
+            lambda m: m.state == "posted"
+            and m.company_id._get_lock_date_violations(
+                m.date,
+                fiscalyear=True,
+                sale=False,
+                purchase=False,
+                tax=True,
+                hard=True,
+            )
+        )
+        if locked_adjustments:
+            today = fields.Date.context_today(self)
+            locked_adjustments._reverse_moves(
+                [
+                    {
+                        "date": today,
+                        "ref": _("Reversal of: %(move)s", move=adjustment.name),
+                    }
+                    for adjustment in locked_adjustments
+                ],
+                cancel=True,
+            )
+        open_adjustments = (adjustments - locked_adjustments).filtered(
+            lambda m: m.state != "cancel"
+        )
+        # Open adjustments still shared with posted invoices are rewritten for
+        # the VAT of those invoices below; the others are cancelled
+        kept_sources = {
+            adjustment: sources
+            for adjustment, sources in remaining_sources.grouped(
+                "l10n_ar_vat_adjustment_move_id"
+            ).items()
+            if adjustment in open_adjustments
+        }
+        reversed_sources = remaining_sources.filtered(
+            lambda m: m.l10n_ar_vat_adjustment_move_id not in kept_sources
+        )
+        cancelled_adjustments = open_adjustments.filtered(
+            lambda m: m not in kept_sources
+        )
+        if cancelled_adjustments:
+            cancelled_adjustments.button_cancel()
+
+        # Put the definitive VAT account back on the invoices
+        for company, invoices in ar_purchases.grouped("company_id").items():
+            if (
+                not company.l10n_ar_vat_credit_account_id
+                or not company.l10n_ar_vat_credit_to_compute_account_id
+            ):
+                continue
+            self.env["account.move.line"].search(
+                [
+                    ("move_id", "in", invoices.ids),
+                    (
+                        "account_id",
+                        "=",
+                        company.l10n_ar_vat_credit_to_compute_account_id.id,
+                    ),
+                ]
+            ).with_context(skip_invoice_sync=True).write(
+                {"account_id": company.l10n_ar_vat_credit_account_id.id}
+            )
 
-            # Create bidirectional relationship
-            adjustment_move.l10n_ar_vat_source_invoice_id = move.id
-            move.l10n_ar_vat_adjustment_move_id = adjustment_move.id
+        (ar_purchases | remaining_sources).filtered(
+            "l10n_ar_vat_adjustment_move_id"
+        ).write({"l10n_ar_vat_adjustment_move_id": False})
+        ar_purchases.filtered("l10n_ar_vat_deferral_date").write(
+            {"l10n_ar_vat_deferral_date": False}
+        )
+        for adjustment, sources in kept_sources.items():
+            sources._l10n_ar_vat_create_adjustment(
+                adjustment.journal_id, vat_amounts, adjustment
+            )
+        # Invoices whose shared adjustment was reversed get a new one
+        if reversed_sources:
+            reversed_sources._create_vat_adjustment_entries()
 
     def action_view_vat_adjustment(self):
         """Open the VAT adjustment entry related to this invoice."""
@@ -293,12 +794,24 @@ class AccountMove(models.Model):
         }
 
     def action_view_source_invoice(self):
-        """Open the source invoice that generated this VAT adjustment."""
+        """Open the source invoice(s) that generated this VAT adjustment."""
         self.ensure_one()
+        sources = (
+            self.l10n_ar_vat_source_invoice_id | self.l10n_ar_vat_source_invoice_ids
+        )
+        if len(sources) > 1:
+            return {
+                "type": "ir.actions.act_window",
+                "name": _("Source Invoices"),
+                "res_model": "account.move",
+                "view_mode": "list,form",
+                "domain": [("id", "in", sources.ids)],
+                "target": "current",
+            }
         return {
             "type": "ir.actions.act_window",
             "res_model": "account.move",
             "view_mode": "form",
-            "res_id": self.l10n_ar_vat_source_invoice_id.id,
+            "res_id": sources.id,
             "target": "current",
         }
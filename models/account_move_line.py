@@ -1,3 +1,5 @@
+from collections import defaultdict
+
 from odoo import models
 from odoo.exceptions import UserError
 from odoo.tools.translate import _
@@ -14,34 +16,35 @@ class AccountMoveLine(models.Model):
         the invoice to be posted with an accounting date in a locked period, while
         the VAT credit is computed in the current open period.
         """
-        ar_purchase_lines = self.env["account.move.line"]
-        other_lines = self.env["account.move.line"]
-
-        for line in self:
-            move = line.move_id
-            if (
-                move.move_type in ("in_invoice", "in_refund")
-                and move.country_code == "AR"
-                and move.l10n_ar_vat_computation_date
-            ):
-                ar_purchase_lines |= line
-            else:
-                other_lines |= line
+        ar_purchase_lines = self.filtered(
+            lambda line: line.move_id.l10n_ar_is_purchase_move
+            and line.move_id.l10n_ar_vat_computation_date
+        )
+        other_lines = self - ar_purchase_lines
 
-        # Check Argentine purchase lines using l10n_ar_vat_computation_date
+        # Check Argentine purchase lines using l10n_ar_vat_computation_date.
+        # Lock dates are resolved once per company and computation date, and
+        # lines are only inspected for the dates actually locked.
+        line_ids_by_key = defaultdict(list)
         for line in ar_purchase_lines:
             move = line.move_id
             if move.state != "posted":
                 continue
-            violated_lock_dates = move.company_id._get_lock_date_violations(
-                move.l10n_ar_vat_computation_date,
+            key = (move.company_id, move.l10n_ar_vat_computation_date)
+            line_ids_by_key[key].append(line.id)
+
+        for (company, computation_date), line_ids in line_ids_by_key.items():
+            violated_lock_dates = company._get_lock_date_violations(
+                computation_date,
                 fiscalyear=False,
                 sale=False,
                 purchase=False,
                 tax=True,
                 hard=True,
             )
-            if violated_lock_dates and line._affect_tax_report():
+            if violated_lock_dates and any(
+                line._affect_tax_report() for line in self.browse(line_ids)
+            ):
                 raise UserError(
                     _(
                         "The operation is refused as it would impact an "
@@ -0,0 +1,481 @@
+import csv
+import io
+import logging
+import re
+import time
+from contextlib import closing, contextmanager
+from datetime import datetime
+from itertools import islice
+
+from odoo import Command, _, api, fields, models
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+# Header of the "Mis Comprobantes Recibidos" export mapped to internal keys.
+# Older exports use the short "Fecha"/"Tipo" headers.
+AFIP_COLUMNS = {
+    "fecha": "date",
+    "fecha de emision": "date",
+    "tipo": "document_type",
+    "tipo de comprobante": "document_type",
+    "punto de venta": "point_of_sale",
+    "numero desde": "number",
+    "nro. doc. emisor": "cuit",
+    "denominacion emisor": "partner_name",
+    "moneda": "currency",
+    "imp. neto gravado": "taxed",
+    "imp. neto no gravado": "not_taxed",
+    "imp. op. exentas": "exempt",
+    "otros tributos": "other_taxes",
+    "iva": "vat",
+    "imp. total": "total",
+}
+
+# AFIP VAT codes by rate, used to pick the tax of the taxed amount
+AFIP_VAT_RATES = {
+    "3": 0.0,
+    "9": 0.025,
+    "8": 0.05,
+    "4": 0.105,
+    "5": 0.21,
+    "6": 0.27,
+}
+
+
+class L10nArAfipReceivedImport(models.Model):
+    _name = "l10n_ar.afip.received.import"
+    _description = "Import AFIP Received Vouchers"
+    _order = "create_date desc, id desc"
+
+    data_file = fields.Binary(string="File", required=True, attachment=True)
+    filename = fields.Char()
+    company_id = fields.Many2one(
+        "res.company", required=True, default=lambda self: self.env.company
+    )
+    journal_id = fields.Many2one(
+        "account.journal",
+        required=True,
+        domain="[('company_id', '=', company_id), ('type', '=', 'purchase'), "
+        "('l10n_latam_use_documents', '=', True)]",
+    )
+    chunk_size = fields.Integer(
+        default=500,
+        help="Number of vouchers created, posted and committed together",
+    )
+    auto_post = fields.Boolean(string="Post Invoices", default=True)
+    state = fields.Selection(
+        [("draft", "Draft"), ("running", "Running"), ("done", "Done")],
+        default="draft",
+        required=True,
+    )
+    processed_rows = fields.Integer(readonly=True)
+    file_position = fields.Integer(
+        readonly=True,
+        help="Byte offset in the file of the first row not imported yet",
+    )
+    file_line = fields.Integer(
+        readonly=True,
+        default=1,
+        help="Number of the last line of the file read so far",
+    )
+    posted_count = fields.Integer(string="Posted", readonly=True)
+    draft_count = fields.Integer(
+        string="Left in Draft",
+        readonly=True,
+        help="Vouchers created but not posted, because posting is disabled or "
+        "failed for them",
+    )
+    error_count = fields.Integer(readonly=True)
+    duration = fields.Float(readonly=True)
+    throughput = fields.Float(
+        string="Vouchers per Second", compute="_compute_throughput"
+    )
+    log = fields.Text(readonly=True)
+
+    @api.depends("posted_count", "draft_count", "duration")
+    def _compute_throughput(self):
+        for job in self:
+            job.throughput = (
+                (job.posted_count + job.draft_count) / job.duration
+                if job.duration
+                else 0.0
+            )
+
+    @api.model
+    def _normalize_header(self, header):
+        header = header.strip().lower()
+        for accented, plain in zip("áéíóú", "aeiou", strict=True):
+            header = header.replace(accented, plain)
+        return header
+
+    @api.model
+    def _parse_amount(self, value):
+        """Parse AFIP amounts, which may use a decimal comma."""
+        value = (value or "").strip()
+        if not value:
+            return 0.0
+        if "," in value:
+            value = value.replace(".", "").replace(",", ".")
+        return float(value)
+
+    @api.model
+    def _parse_date(self, value):
+        value = value.strip()
+        for date_format in ("%d/%m/%Y", "%Y-%m-%d"):
+            try:
+                return datetime.strptime(value, date_format).date()
+            except ValueError:
+                continue
+        raise UserError(_("Invalid date %(date)s", date=value))
+
+    @contextmanager
+    def _open_file(self):
+        """Open the uploaded file from its attachment, without decoding it.
+
+        Files of the filestore are opened in place; files stored in the
+        database are read from their ``raw`` value.
+        """
+        self.ensure_one()
+        attachment = (
+            self.env["ir.attachment"]
+            .sudo()
+            .search(
+                [
+                    ("res_model", "=", self._name),
+                    ("res_field", "=", "data_file"),
+                    ("res_id", "=", self.id),
+                ],
+                limit=1,
+            )
+        )
+        if not attachment:
+            raise UserError(_("The file to import is missing."))
+        if attachment.store_fname:
+            stream = open(attachment._full_path(attachment.store_fname), "rb")
+        else:
+            stream = io.BytesIO(attachment.raw)
+        with stream:
+            yield stream
+
+    def _read_rows(self, position=0, line_number=1):
+        """Yield the rows of the uploaded file, lazily, from a byte offset.
+
+        The header is always read from the start of the file, then the rows
+        are read from ``position``, so a chunk does not parse the rows of the
+        chunks before it.
+
+        :param position: byte offset of the first row to read, 0 for the row
+            following the header
+        :param line_number: number of the line preceding ``position``
+        :return: generator of (line number, row dict, byte offset of the
+            next row)
+        """
+        with self._open_file() as stream:
+            header_line = stream.readline().decode("utf-8-sig")
+            delimiter = ";" if ";" in header_line else ","
+            header = next(csv.reader([header_line], delimiter=delimiter))
+            keys = [AFIP_COLUMNS.get(self._normalize_header(name)) for name in header]
+            if "document_type" not in keys or "cuit" not in keys:
+                raise UserError(
+                    _("The file is not an AFIP 'Mis Comprobantes Recibidos' export.")
+                )
+            if position:
+                stream.seek(position)
+            for raw_line in iter(stream.readline, b""):
+                line_number += 1
+                values = next(
+                    csv.reader([raw_line.decode("utf-8")], delimiter=delimiter), []
+                )
+                if not any(values):
+                    continue
+                row = {
+                    key: value for key, value in zip(keys, values, strict=False) if key
+                }
+                yield line_number, row, stream.tell()
+
+    def _get_lookup_maps(self):
+        """Preload the records every row is matched against."""
+        document_types = {
+            document_type["code"]: document_type
+            for document_type in self.env["l10n_latam.document.type"].search_read(
+                [("country_id.code", "=", "AR")], ["code", "internal_type"]
+            )
+        }
+        vat_taxes = {}
+        for tax in self.env["account.tax"].search(
+            [
+                ("company_id", "=", self.company_id.id),
+                ("type_tax_use", "=", "purchase"),
+                ("tax_group_id.l10n_ar_vat_afip_code", "!=", False),
+            ]
+        ):
+            vat_taxes.setdefault(tax.tax_group_id.l10n_ar_vat_afip_code, tax.id)
+        currencies = {
+            currency.l10n_ar_afip_code: currency.id
+            for currency in self.env["res.currency"].search(
+                [("l10n_ar_afip_code", "!=", False)]
+            )
+        }
+        currencies["$"] = self.company_id.currency_id.id
+        return document_types, vat_taxes, currencies
+
+    def _get_partner_map(self, rows):
+        cuits = {re.sub(r"\D", "", row.get("cuit", "")) for __, row in rows}
+        return {
+            partner.vat: partner.id
+            for partner in self.env["res.partner"].search(
+                [
+                    ("vat", "in", list(cuits)),
+                    ("parent_id", "=", False),
+                    "|",
+                    ("company_id", "=", False),
+                    ("company_id", "=", self.company_id.id),
+                ]
+            )
+        }
+
+    def _prepare_invoice_vals(
+        self, row, partners, document_types, vat_taxes, currencies
+    ):
+        """Build the create values of one voucher, raising UserError if invalid."""
+        cuit = re.sub(r"\D", "", row.get("cuit", ""))
+        if cuit not in partners:
+            raise UserError(
+                _(
+                    "No vendor with CUIT %(cuit)s (%(name)s)",
+                    cuit=cuit,
+                    name=row.get("partner_name"),
+                )
+            )
+        document_code = row["document_type"].split("-")[0].strip()
+        document_type = document_types.get(document_code)
+        if not document_type:
+            raise UserError(
+                _("Unknown document type %(type)s", type=row["document_type"])
+            )
+        currency = row.get("currency", "$").strip() or "$"
+        if currency not in currencies:
+            raise UserError(_("Unknown currency %(currency)s", currency=currency))
+
+        taxed = self._parse_amount(row.get("taxed"))
+        vat = self._parse_amount(row.get("vat"))
+        lines = []
+        if taxed:
+            rate = vat / taxed
+            vat_code = min(
+                AFIP_VAT_RATES, key=lambda code: abs(AFIP_VAT_RATES[code] - rate)
+            )
+            if (
+                abs(AFIP_VAT_RATES[vat_code] - rate) > 0.005
+                or vat_code not in vat_taxes
+            ):
+                raise UserError(
+                    _(
+                        "No purchase VAT tax matches a rate of %(rate)s%%",
+                        rate=round(rate * 100, 2),
+                    )
+                )
+            lines.append((_("Taxed amount"), taxed, vat_taxes[vat_code]))
+        for key, label, vat_code in (
+            ("not_taxed", _("Not taxed amount"), "1"),
+            ("exempt", _("Exempt amount"), "2"),
+            ("other_taxes", _("Other taxes"), None),
+        ):
+            amount = self._parse_amount(row.get(key))
+            if amount:
+                lines.append((label, amount, vat_taxes.get(vat_code)))
+
+        return {
+            "move_type": (
+                "in_refund"
+                if document_type["internal_type"] == "credit_note"
+                else "in_invoice"
+            ),
+            "company_id": self.company_id.id,
+            "journal_id": self.journal_id.id,
+            "partner_id": partners[cuit],
+            "invoice_date": self._parse_date(row["date"]),
+            "currency_id": currencies[currency],
+            "l10n_latam_document_type_id": document_type["id"],
+            "l10n_latam_document_number": "%05d-%08d"
+            % (int(row["point_of_sale"]), int(row["number"])),
+            "invoice_line_ids": [
+                Command.create(
+                    {
+                        "name": label,
+                        "quantity": 1,
+                        "price_unit": amount,
+                        "account_id": self.journal_id.default_account_id.id,
+                        "tax_ids": [Command.set([tax_id] if tax_id else [])],
+                    }
+                )
+                for label, amount, tax_id in lines
+            ],
+        }
+
+    def _process_in_batch(self, records, operation, errors):
+        """Apply ``operation`` to the whole batch, isolating failing rows.
+
+        ``records`` is a list of (line number, payload) and ``operation`` takes
+        a list of payloads and returns a recordset in the same order. The batch
+        is tried at once; if it fails, each row is retried alone so that only
+        the faulty ones are reported in ``errors``.
+
+        :return: list of (line number, record) for the rows that succeeded
+        """
+        try:
+            with self.env.cr.savepoint():
+                results = operation([payload for __, payload in records])
+            return list(zip([line for line, __ in records], results, strict=True))
+        except Exception:  # noqa: BLE001 - retried row by row below
+            succeeded = []
+            for line_number, payload in records:
+                try:
+                    with self.env.cr.savepoint():
+                        succeeded.append((line_number, operation([payload])))
+                except Exception as e:  # noqa: BLE001 - reported per row
+                    errors.append((line_number, str(e)))
+            return succeeded
+
+    def action_import(self):
+        """Queue the import of the file, which is processed in the background.
+
+        The header is checked right away; the rows are then imported by the
+        import cron, one chunk per call, and every chunk is committed on its
+        own so a failure late in a large file does not roll back the vouchers
+        already imported.
+        """
+        self.ensure_one()
+        with closing(self._read_rows()) as reader:
+            next(reader, None)
+        self.state = "running"
+        self._trigger_cron()
+        return True
+
+    def _import_next_chunk(self):
+        """Import the next chunk of rows, reporting the rows that failed.
+
+        The chunk is created with a single ``create`` call and posted with a
+        single ``action_post`` call, so the VAT deferral of the whole chunk
+        goes through the batched ``_post`` path.
+        """
+        self.ensure_one()
+        start = time.perf_counter()
+        Move = self.env["account.move"].with_company(self.company_id)
+        chunk_size = max(self.chunk_size, 1)
+        with closing(self._read_rows(self.file_position, self.file_line)) as reader:
+            chunk = list(islice(reader, chunk_size))
+        rows = [(line_number, row) for line_number, row, __ in chunk]
+        errors = []
+        posted = []
+
+        def post(moves):
+            moves = Move.union(*moves)
+            moves.action_post()
+            return moves
+
+        created = []
+        if rows:
+            document_types, vat_taxes, currencies = self._get_lookup_maps()
+            partners = self._get_partner_map(rows)
+            vals_by_line = []
+            for line_number, row in rows:
+                try:
+                    vals = self._prepare_invoice_vals(
+                        row, partners, document_types, vat_taxes, currencies
+                    )
+                except (UserError, ValueError, KeyError) as e:
+                    errors.append((line_number, str(e)))
+                    continue
+                vals_by_line.append((line_number, vals))
+
+            created = self._process_in_batch(vals_by_line, Move.create, errors)
+            if self.auto_post and created:
+                posted = self._process_in_batch(created, post, errors)
+
+        self.write(
+            {
+                "state": "done" if len(rows) < chunk_size else "running",
+                "processed_rows": self.processed_rows + len(rows),
+                "file_position": chunk[-1][2] if chunk else self.file_position,
+                "file_line": chunk[-1][0] if chunk else self.file_line,
+                "posted_count": self.posted_count + len(posted),
+                "draft_count": self.draft_count + len(created) - len(posted),
+                "error_count": self.error_count + len(errors),
+                "duration": self.duration + time.perf_counter() - start,
+                "log": "\n".join(
+                    filter(
+                        None,
+                        [self.log]
+                        + [
+                            _("Line %(line)s: %(error)s", line=line, error=error)
+                            for line, error in sorted(errors)
+                        ],
+                    )
+                ),
+            }
+        )
+        if self.state == "done":
+            _logger.info(
+                "AFIP received vouchers import: %s posted, %s in draft, %s errors "
+                "in %.2fs",
+                self.posted_count,
+                self.draft_count,
+                self.error_count,
+                self.duration,
+            )
+            self._notify_user()
+
+    def _notify_user(self):
+        self.ensure_one()
+        self.create_uid._bus_send(
+            "simple_notification",
+            {
+                "type": "warning" if self.error_count else "success",
+                "title": _("AFIP received vouchers imported"),
+                "message": _(
+                    "%(posted)s voucher(s) posted, %(draft)s left in draft, "
+                    "%(errors)s row(s) in error.",
+                    posted=self.posted_count,
+                    draft=self.draft_count,
+                    errors=self.error_count,
+                ),
+            },
+        )
+
+    @api.model
+    def _cron_process_imports(self):
+        """Import one chunk of the least recently processed running import.
+
+        Imports are served round-robin, one chunk per call, and the cron is
+        called again right away while chunks remain. Each call is committed on
+        its own.
+        """
+        job = self.search(
+            [("state", "=", "running")], order="write_date, id", limit=1
+        )
+        if not job:
+            return
+        try:
+            with self.env.cr.savepoint():
+                job.with_user(job.create_uid)._import_next_chunk()
+        except Exception as e:  # noqa: BLE001 - the import records the failure
+            _logger.exception("AFIP received vouchers import %s failed", job.id)
+            job.write(
+                {
+                    "state": "done",
+                    "error_count": job.error_count + 1,
+                    "log": "\n".join(filter(None, [job.log, str(e)])),
+                }
+            )
+            job._notify_user()
+
+        remaining = self.search_count([("state", "=", "running")])
+        self.env["ir.cron"]._notify_progress(done=1, remaining=remaining)
+
+    @api.model
+    def _trigger_cron(self):
+        self.env.ref(
+            "l10n_ar_vat_computation_date.ir_cron_l10n_ar_afip_received_import"
+        )._trigger()
@@ -0,0 +1,210 @@
+import base64
+import logging
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import _, api, fields, models
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+
+class L10nArVatBookExport(models.Model):
+    _name = "l10n_ar.vat.book.export"
+    _description = "VAT Book Background Export"
+    _order = "create_date desc, id desc"
+
+    report_id = fields.Many2one("account.report", required=True, readonly=True)
+    company_id = fields.Many2one(
+        "res.company",
+        required=True,
+        readonly=True,
+        default=lambda self: self.env.company,
+    )
+    user_id = fields.Many2one(
+        "res.users",
+        string="Requested By",
+        required=True,
+        readonly=True,
+        default=lambda self: self.env.user,
+    )
+    options = fields.Json(readonly=True)
+    file_format = fields.Selection(
+        [("xlsx", "XLSX"), ("pdf", "PDF")],
+        required=True,
+        readonly=True,
+        default="xlsx",
+    )
+    state = fields.Selection(
+        [
+            ("pending", "Pending"),
+            ("running", "Running"),
+            ("done", "Done"),
+            ("failed", "Failed"),
+        ],
+        required=True,
+        readonly=True,
+        default="pending",
+    )
+    chunk_dates = fields.Json(
+        readonly=True,
+        help="Monthly (date_from, date_to) ranges rendered one per cron call",
+    )
+    chunk_done = fields.Integer(readonly=True)
+    progress = fields.Float(compute="_compute_progress")
+    attachment_ids = fields.Many2many("ir.attachment", string="Files", readonly=True)
+    error = fields.Text(readonly=True)
+
+    @api.depends("chunk_dates", "chunk_done")
+    def _compute_progress(self):
+        for job in self:
+            total = len(job.chunk_dates or [])
+            job.progress = 100.0 * job.chunk_done / total if total else 0.0
+
+    @api.model
+    def _split_period(self, date_from, date_to):
+        """Split a period in monthly ranges, the unit of work of the export."""
+        date_from = fields.Date.to_date(date_from)
+        date_to = fields.Date.to_date(date_to)
+        chunks = []
+        while date_from <= date_to:
+            chunk_to = min(date_from + relativedelta(day=31), date_to)
+            chunks.append(
+                (fields.Date.to_string(date_from), fields.Date.to_string(chunk_to))
+            )
+            date_from = chunk_to + relativedelta(days=1)
+        return chunks
+
+    @api.model
+    def _enqueue(self, report, options, file_format):
+        """Queue the export of a VAT book and wake up the export cron.
+
+        Jobs are read-only for users, as the cron renders them with the
+        requesting user and options stored on the job; they are only created
+        here, for the current user and company.
+        """
+        handler = self.env["l10n_ar.tax.report.handler"]
+        date_from, date_to = handler._vat_book_get_period(options)
+        job = self.sudo().create(
+            {
+                "report_id": report.id,
+                "company_id": self.env.company.id,
+                "user_id": self.env.user.id,
+                "options": options,
+                "file_format": file_format,
+                "chunk_dates": self._split_period(date_from, date_to),
+            }
+        )
+        self._trigger_cron()
+        return job.sudo(False)
+
+    def _render_next_chunk(self):
+        """Render the next monthly chunk of the export as an attachment.
+
+        The VAT book is filed monthly, so the export produces one file per
+        month of the period rather than a single merged file. Each month is
+        fingerprinted from the lines rendered in its file.
+        """
+        self.ensure_one()
+        chunk_from, chunk_to = self.chunk_dates[self.chunk_done]
+        options = dict(self.options)
+        options["date"] = dict(
+            options.get("date", {}), date_from=chunk_from, date_to=chunk_to
+        )
+        options["_original_date_from"] = chunk_from
+        options["_original_date_to"] = chunk_to
+
+        report = self.report_id.with_company(self.company_id).with_user(self.user_id)
+        if self.file_format == "pdf":
+            export = report.export_to_pdf(options)
+        else:
+            export = report.export_to_xlsx(options)
+
+        attachment = self.env["ir.attachment"].create(
+            {
+                "name": f"{chunk_from[:7]}_{export['file_name']}",
+                "datas": base64.b64encode(export["file_content"]),
+                "res_model": self._name,
+                "res_id": self.id,
+            }
+        )
+        self.write(
+            {
+                "state": "running",
+                "chunk_done": self.chunk_done + 1,
+                "attachment_ids": [(4, attachment.id)],
+            }
+        )
+        if self.chunk_done == len(self.chunk_dates):
+            self.state = "done"
+            self._notify_user()
+
+    def _notify_user(self):
+        self.ensure_one()
+        if self.state == "done":
+            notification = {
+                "type": "success",
+                "title": _("VAT book export ready"),
+                "message": _(
+                    "%(count)s monthly file(s) are attached to the export of "
+                    "%(report)s.",
+                    count=len(self.attachment_ids),
+                    report=self.report_id.name,
+                ),
+            }
+        else:
+            notification = {
+                "type": "danger",
+                "title": _("VAT book export failed"),
+                "message": self.error,
+            }
+        self.user_id._bus_send("simple_notification", notification)
+
+    @api.model
+    def _cron_process_exports(self):
+        """Render one chunk of the least recently processed export.
+
+        The cron never runs on two workers at once, so exports are rendered
+        sequentially, one monthly chunk per call. Jobs are served round-robin
+        so a long export does not hold back the ones queued after it; the
+        cron is called again right away while chunks remain.
+        """
+        self.env.cr.execute(
+            SQL(
+                """
+                SELECT id FROM %s
+                WHERE state IN ('pending', 'running')
+                ORDER BY write_date, id
+                LIMIT 1
+                """,
+                SQL.identifier(self._table),
+            )
+        )
+        row = self.env.cr.fetchone()
+        if not row:
+            return
+        job = self.browse(row[0])
+        try:
+            with self.env.cr.savepoint():
+                job._render_next_chunk()
+        except Exception as e:  # noqa: BLE001 - the job records the failure
+            _logger.exception("VAT book export %s failed", job.id)
+            job.write({"state": "failed", "error": str(e)})
+            job._notify_user()
+
+        remaining = self.search_count([("state", "in", ("pending", "running"))])
+        self.env["ir.cron"]._notify_progress(done=1, remaining=remaining)
+
+    @api.model
+    def _trigger_cron(self):
+        self.env.ref(
+            "l10n_ar_vat_computation_date.ir_cron_l10n_ar_vat_book_export"
+        )._trigger()
+
+    def action_retry(self):
+        """Resume failed exports from the chunk that failed."""
+        self.check_access("read")
+        self.sudo().filtered(lambda job: job.state == "failed").write(
+            {"state": "pending", "error": False}
+        )
+        self._trigger_cron()
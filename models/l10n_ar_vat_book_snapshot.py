@@ -0,0 +1,111 @@
+import hashlib
+
+from odoo import _, api, fields, models
+
+class L10nArVatBookSnapshot(models.Model):
+    _name = "l10n_ar.vat.book.snapshot"
+    _description = "VAT Book Export Snapshot"
+    _order = "create_date desc, id desc"
+
+    company_id = fields.Many2one(
+        "res.company",
+        required=True,
+        readonly=True,
+        default=lambda self: self.env.company,
+    )
+    report_id = fields.Many2one(
+        "account.report", required=True, readonly=True, ondelete="cascade"
+    )
+    options = fields.Json(
+        readonly=True,
+        help="Report options the VAT book was exported with, reused to compute "
+        "the delta on the same book",
+    )
+    date_from = fields.Date(required=True, readonly=True)
+    date_to = fields.Date(required=True, readonly=True)
+    tax_types = fields.Char(
+        required=True,
+        readonly=True,
+        help="Comma separated tax types (sale, purchase) included in the export",
+    )
+    row_count = fields.Integer(readonly=True)
+    fingerprint = fields.Json(
+        readonly=True,
+        help="Hash of the amounts of every exported line, keyed by move and "
+        "column group",
+    )
+
+    @api.depends("date_from", "date_to", "tax_types")
+    def _compute_display_name(self):
+        for snapshot in self:
+            snapshot.display_name = _(
+                "%(types)s %(date_from)s - %(date_to)s",
+                types=snapshot.tax_types,
+                date_from=snapshot.date_from,
+                date_to=snapshot.date_to,
+            )
+
+    @api.model
+    def _hash_values(self, values):
+        """Hash the column values of a VAT book line."""
+        payload = "|".join(str(value) for value in values)
+        return hashlib.md5(payload.encode()).hexdigest()
+
+    @api.model
+    def _take(self, report, options, date_from, date_to, tax_types, fingerprint):
+        """Store the fingerprint of the VAT book exported with these options.
+
+        :param fingerprint: line hashes collected while the exported lines were
+            generated, as returned by ``_vat_book_fingerprint_lines``
+        """
+        return self.create(
+            {
+                "company_id": self.env.company.id,
+                "report_id": report.id,
+                "options": options,
+                "date_from": date_from,
+                "date_to": date_to,
+                "tax_types": ",".join(sorted(tax_types)),
+                "row_count": len(fingerprint),
+                "fingerprint": fingerprint,
+            }
+        )
+
+    def _get_delta(self):
+        """Compare the snapshot with the current VAT book of the same options.
+
+        :return: dict with the keys (``<move_id>-<column_group_key>``) of the
+            ``added``, ``changed`` and ``removed`` lines
+        """
+        self.ensure_one()
+        report = self.report_id.with_company(self.company_id)
+        handler = report.env[report._get_custom_handler_model()]
+        current = handler._vat_book_fingerprint(report, self.options)
+        fingerprint = self.fingerprint or {}
+        return {
+            "added": [key for key in current if key not in fingerprint],
+            "changed": [
+                key
+                for key, line_hash in current.items()
+                if key in fingerprint and fingerprint[key] != line_hash
+            ],
+            "removed": [key for key in fingerprint if key not in current],
+        }
+
+    def action_view_delta(self):
+        """Open the VAT lines added or changed since the snapshot was taken."""
+        self.ensure_one()
+        delta = self._get_delta()
+        move_ids = {
+            int(key.split("-")[0])
+            for keys in delta.values()
+            for key in keys
+        }
+        return {
+            "type": "ir.actions.act_window",
+            "name": _("VAT Book Delta"),
+            "res_model": "account.ar.vat.line",
+            "view_mode": "list,pivot",
+            "domain": [("move_id", "in", list(move_ids))],
+            "target": "current",
+        }
@@ -0,0 +1,213 @@
+from collections import defaultdict
+from datetime import date
+
+from odoo import _, api, fields, models
+from odoo.exceptions import AccessError
+from odoo.tools import SQL
+
+SETTLED_UNTIL_PARAM = "l10n_ar_vat_computation_date.summary_settled_until"
+
+
+class L10nArVatDeferredSummary(models.Model):
+    _name = "l10n_ar.vat.deferred.summary"
+    _description = "Deferred VAT Credit Summary"
+    _order = "period_date desc, computation_date desc, company_id"
+
+    company_id = fields.Many2one("res.company", required=True, readonly=True)
+    currency_id = fields.Many2one(related="company_id.currency_id")
+    period_date = fields.Date(
+        string="Original Period",
+        required=True,
+        readonly=True,
+        help="First day of the month of the accounting date of the invoices",
+    )
+    computation_date = fields.Date(
+        string="Computation Period",
+        required=True,
+        readonly=True,
+        help="First day of the month in which the VAT credit is computed, as "
+        "determined when the invoices were posted",
+    )
+    amount_deferred = fields.Monetary(readonly=True)
+    amount_settled = fields.Monetary(
+        readonly=True,
+        help="Deferred VAT moved to the definitive account by AJIVA entries "
+        "whose date is reached",
+    )
+    amount_pending = fields.Monetary(readonly=True)
+
+    _sql_constraints = [
+        (
+            "company_period_uniq",
+            "unique(company_id, period_date, computation_date)",
+            "There can only be one summary line per company and periods.",
+        ),
+    ]
+
+    @api.model
+    def _add_amounts(self, entries):
+        """Add deferred and settled VAT amounts to the summary.
+
+        :param entries: iterable of (company id, accounting date, VAT
+            computation date, deferred amount, settled amount); amounts are
+            deltas and may be negative
+        """
+        totals = defaultdict(lambda: [0.0, 0.0])
+        for company_id, date, computation_date, deferred, settled in entries:
+            key = (company_id, date.replace(day=1), computation_date.replace(day=1))
+            totals[key][0] += deferred
+            totals[key][1] += settled
+        if not totals:
+            return
+
+        self.env.cr.execute(
+            SQL(
+                """
+                INSERT INTO %(table)s AS summary (
+                    company_id, period_date, computation_date,
+                    amount_deferred, amount_settled, amount_pending,
+                    create_uid, create_date, write_uid, write_date
+                )
+                VALUES %(values)s
+                ON CONFLICT (company_id, period_date, computation_date)
+                DO UPDATE SET
+                    amount_deferred = summary.amount_deferred
+                        + EXCLUDED.amount_deferred,
+                    amount_settled = summary.amount_settled
+                        + EXCLUDED.amount_settled,
+                    amount_pending = summary.amount_pending
+                        + EXCLUDED.amount_pending,
+                    write_uid = EXCLUDED.write_uid,
+                    write_date = EXCLUDED.write_date
+                """,
+                table=SQL.identifier(self._table),
+                values=SQL(", ").join(
+                    SQL(
+                        "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                        company_id,
+                        period_date,
+                        computation_date,
+                        deferred,
+                        settled,
+                        deferred - settled,
+                        self.env.uid,
+                        self.env.cr.now(),
+                        self.env.uid,
+                        self.env.cr.now(),
+                    )
+                    for (company_id, period_date, computation_date), (
+                        deferred,
+                        settled,
+                    ) in totals.items()
+                ),
+            )
+        )
+        self.invalidate_model()
+
+    @api.model
+    def _rebuild(self, companies=None):
+        """Recompute the summary from the posted purchase invoices.
+
+        :param companies: companies whose summary is rebuilt, all of them if
+            not given
+        """
+        self.env.flush_all()
+        company_ids = tuple(companies.ids) if companies else None
+        settled_until = self._get_settled_until()
+        self.env.cr.execute(
+            SQL(
+                "DELETE FROM %s WHERE %s",
+                SQL.identifier(self._table),
+                SQL("company_id IN %s", company_ids) if company_ids else SQL("TRUE"),
+            )
+        )
+        self.env.cr.execute(
+            SQL(
+                """
+                INSERT INTO %(table)s (
+                    company_id, period_date, computation_date,
+                    amount_deferred, amount_settled, amount_pending,
+                    create_uid, create_date, write_uid, write_date
+                )
+                SELECT m.company_id,
+                       date_trunc('month', m.date)::date,
+                       date_trunc('month', m.l10n_ar_vat_deferral_date)::date,
+                       SUM(l.balance),
+                       SUM(CASE WHEN %(settled)s THEN l.balance ELSE 0 END),
+                       SUM(CASE WHEN %(settled)s THEN 0 ELSE l.balance END),
+                       %(uid)s, %(now)s, %(uid)s, %(now)s
+                  FROM account_move m
+                  JOIN res_company c ON c.id = m.company_id
+                  JOIN account_move_line l
+                    ON l.move_id = m.id
+                   AND l.account_id = c.l10n_ar_vat_credit_to_compute_account_id
+             LEFT JOIN account_move adj ON adj.id = m.l10n_ar_vat_adjustment_move_id
+                 WHERE m.l10n_ar_is_purchase_move
+                   AND m.state = 'posted'
+                   AND %(company_condition)s
+                   AND m.l10n_ar_vat_deferral_date IS NOT NULL
+              GROUP BY 1, 2, 3
+                """,
+                table=SQL.identifier(self._table),
+                uid=self.env.uid,
+                now=self.env.cr.now(),
+                settled=SQL(
+                    "adj.state = 'posted' AND adj.date <= %s", settled_until
+                ),
+                company_condition=(
+                    SQL("m.company_id IN %s", company_ids)
+                    if company_ids
+                    else SQL("TRUE")
+                ),
+            )
+        )
+        self.invalidate_model()
+
+    @api.model
+    def _get_settled_until(self):
+        """Return the date up to which adjustments count as settled.
+
+        Deferred VAT is settled once the date of its posted adjustment entry
+        is reached; the date is moved forward by ``_cron_settle_due``.
+        """
+        settled_until = (
+            self.env["ir.config_parameter"].sudo().get_param(SETTLED_UNTIL_PARAM)
+        )
+        return fields.Date.to_date(settled_until) if settled_until else date.min
+
+    @api.model
+    def _cron_settle_due(self):
+        """Settle the deferred VAT whose adjustment date has been reached."""
+        settled_until = self._get_settled_until()
+        today = fields.Date.context_today(self)
+        if settled_until >= today:
+            return
+        self.env["ir.config_parameter"].sudo().set_param(
+            SETTLED_UNTIL_PARAM, fields.Date.to_string(today)
+        )
+        moves = (
+            self.env["account.move"]
+            .sudo()
+            .search(
+                [
+                    ("l10n_ar_is_purchase_move", "=", True),
+                    ("state", "=", "posted"),
+                    ("l10n_ar_vat_deferral_date", "!=", False),
+                    ("l10n_ar_vat_adjustment_move_id.state", "=", "posted"),
+                    ("l10n_ar_vat_adjustment_move_id.date", ">", settled_until),
+                    ("l10n_ar_vat_adjustment_move_id.date", "<=", today),
+                ]
+            )
+        )
+        moves._l10n_ar_vat_update_summary(
+            moves._l10n_ar_vat_deferred_amounts(), settled=1
+        )
+
+    def action_rebuild(self):
+        """Rebuild the summary of the companies the user is working on."""
+        if not self.env.user.has_group("account.group_account_manager"):
+            raise AccessError(
+                _("Only accounting managers can rebuild the deferred VAT summary.")
+            )
+        self._rebuild(self.env.companies)
+        return {"type": "ir.actions.client", "tag": "reload"}
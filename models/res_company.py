@@ -22,6 +22,28 @@ class ResCompany(models.Model):
         domain="[('company_id', '=', id), ('account_type', '=', 'asset_current')]",
     )
 
+    l10n_ar_vat_net_adjustments = fields.Boolean(
+        string="Net VAT Adjustments",
+        help="Post a single VAT adjustment entry per partner and VAT computation "
+        "date for the invoices and refunds, instead of one entry per document. "
+        "Documents posted later are netted with the open entry of their partner "
+        "and period.",
+    )
+
+    l10n_ar_vat_post_profiling = fields.Boolean(
+        string="Profile VAT Deferral Posting",
+        help="Log the duration and query count of each stage of purchase invoice "
+        "posting (VAT account swap, core posting, adjustment entries).",
+    )
+
+    l10n_ar_vat_post_slow_threshold = fields.Float(
+        string="Slow Posting Threshold (s)",
+        default=5.0,
+        help="When posting profiling is enabled, batches taking longer than this "
+        "number of seconds are logged as warnings with the offending move ids. "
+        "Set to 0 to disable the warning.",
+    )
+
     @api.constrains(
         "l10n_ar_vat_credit_account_id", "l10n_ar_vat_credit_to_compute_account_id"
     )
@@ -1,4 +1,7 @@
-from odoo import fields, models
+from datetime import date
+
+from odoo import api, fields, models
+from odoo.tools import SQL
 
 
 class ResConfigSettings(models.TransientModel):
@@ -12,3 +15,115 @@ class ResConfigSettings(models.TransientModel):
         related="company_id.l10n_ar_vat_credit_to_compute_account_id",
         readonly=False,
     )
+    l10n_ar_vat_net_adjustments = fields.Boolean(
+        related="company_id.l10n_ar_vat_net_adjustments",
+        readonly=False,
+    )
+    l10n_ar_vat_post_profiling = fields.Boolean(
+        related="company_id.l10n_ar_vat_post_profiling",
+        readonly=False,
+    )
+    l10n_ar_vat_post_slow_threshold = fields.Float(
+        related="company_id.l10n_ar_vat_post_slow_threshold",
+        readonly=False,
+    )
+
+    l10n_ar_vat_report_use_replica = fields.Boolean(
+        string="VAT Reports on Replica",
+        config_parameter="l10n_ar_vat_computation_date.report_use_replica",
+        help="Run the VAT book and VAT Simple queries on the read replica "
+        "configured for Odoo with the db_replica_host and db_replica_port "
+        "options.",
+    )
+    l10n_ar_vat_report_replica_max_lag = fields.Integer(
+        string="Replica Max Lag (s)",
+        config_parameter="l10n_ar_vat_computation_date.report_replica_max_lag",
+        default=60,
+        help="Reports fall back to the primary database when the replica is "
+        "further behind than this number of seconds.",
+    )
+
+    l10n_ar_vat_preview_lock_date = fields.Date(
+        string="Proposed Tax Lock Date",
+        help="Preview how many purchase invoices would be deferred by moving the "
+        "tax lock date to this date. Nothing is changed.",
+    )
+    l10n_ar_vat_preview_draft_count = fields.Integer(
+        string="Draft Invoices Deferred",
+        compute="_compute_l10n_ar_vat_preview",
+    )
+    l10n_ar_vat_preview_posted_count = fields.Integer(
+        string="Posted Invoices Locked",
+        compute="_compute_l10n_ar_vat_preview",
+        help="Posted purchase invoices of the newly locked period. Their VAT is "
+        "already booked and is not moved.",
+    )
+    l10n_ar_vat_preview_amount = fields.Monetary(
+        string="VAT Moved To Compute",
+        help="VAT of the draft purchase invoices that would be booked on the VAT "
+        "Credit To Compute Account when posted.",
+        currency_field="currency_id",
+        compute="_compute_l10n_ar_vat_preview",
+    )
+
+    @api.depends(
+        "l10n_ar_vat_preview_lock_date",
+        "company_id",
+        "company_id.tax_lock_date",
+        "l10n_ar_vat_credit_account_id",
+        "l10n_ar_vat_credit_to_compute_account_id",
+    )
+    def _compute_l10n_ar_vat_preview(self):
+        """Aggregate the impact of the proposed lock date in a single query.
+
+        Only the AR purchase invoices of the newly locked period, after the
+        current tax lock date and up to the proposed one, are counted. Draft
+        ones would be deferred when posted, so only their VAT, read from the
+        tax lines on the VAT credit accounts, is reported as moved; posted ones
+        are counted apart.
+        """
+        for settings in self:
+            settings.l10n_ar_vat_preview_draft_count = 0
+            settings.l10n_ar_vat_preview_posted_count = 0
+            settings.l10n_ar_vat_preview_amount = 0.0
+            lock_date = settings.l10n_ar_vat_preview_lock_date
+            if not lock_date:
+                continue
+
+            vat_accounts = (
+                settings.l10n_ar_vat_credit_account_id
+                | settings.l10n_ar_vat_credit_to_compute_account_id
+            )
+            self.env.cr.execute(
+                SQL(
+                    """
+                    SELECT m.state,
+                           COUNT(DISTINCT m.id),
+                           COALESCE(SUM(l.balance), 0)
+                      FROM account_move m
+                 LEFT JOIN account_move_line l
+                        ON l.move_id = m.id
+                       AND l.tax_line_id IS NOT NULL
+                       AND l.account_id = ANY(%(vat_accounts)s)
+                     WHERE m.company_id = %(company_id)s
+                       AND m.l10n_ar_is_purchase_move
+                       AND m.state IN ('draft', 'posted')
+                       AND m.date > %(current_lock_date)s
+                       AND m.date <= %(lock_date)s
+                       AND COALESCE(m.l10n_ar_vat_computation_date, m.date)
+                           <= %(lock_date)s
+                  GROUP BY m.state
+                    """,
+                    vat_accounts=vat_accounts.ids,
+                    company_id=settings.company_id.id,
+                    current_lock_date=settings.company_id.tax_lock_date
+                    or date.min,
+                    lock_date=lock_date,
+                )
+            )
+            for state, count, amount in self.env.cr.fetchall():
+                if state == "draft":
+                    settings.l10n_ar_vat_preview_draft_count = count
+                    settings.l10n_ar_vat_preview_amount = amount
+                else:
+                    settings.l10n_ar_vat_preview_posted_count = count
@@ -1,2 +1,3 @@
+from . import account_report
 from . import account_ar_vat_line
 from . import l10n_ar_vat_book
@@ -1,6 +1,63 @@
-from odoo import api, fields, models
+import os
+import tempfile
+import uuid
+
+from odoo import _, api, fields, models
+from odoo.exceptions import AccessError, UserError
 from odoo.tools import SQL
 
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Precision and scale of the money columns of the columnar export, written as
+# decimals so amounts are not rounded through floats
+MONEY_PRECISION = 20
+MONEY_SCALE = 2
+MONEY_SQL_TYPE = f"numeric({MONEY_PRECISION}, {MONEY_SCALE})"
+
+# Arguments of the pyarrow types that take some
+ARROW_TYPE_ARGS = {"decimal128": (MONEY_PRECISION, MONEY_SCALE)}
+
+# Columns of the columnar export: (name, SQL cast, pyarrow type name)
+COLUMNAR_COLUMNS = (
+    ("move_id", "int8", "int64"),
+    ("move_name", "text", "string"),
+    ("move_type", "text", "string"),
+    ("state", "text", "string"),
+    ("company_id", "int8", "int64"),
+    ("journal_id", "int8", "int64"),
+    ("partner_id", "int8", "int64"),
+    ("partner_name", "text", "string"),
+    ("cuit", "text", "string"),
+    ("afip_responsibility_type_name", "text", "string"),
+    ("document_type_id", "int8", "int64"),
+    ("tax_type", "text", "string"),
+    ("date", "date", "date32"),
+    ("invoice_date", "date", "date32"),
+    ("vat_computation_date", "date", "date32"),
+    ("taxed", MONEY_SQL_TYPE, "decimal128"),
+    ("base_10", MONEY_SQL_TYPE, "decimal128"),
+    ("vat_10", MONEY_SQL_TYPE, "decimal128"),
+    ("base_21", MONEY_SQL_TYPE, "decimal128"),
+    ("vat_21", MONEY_SQL_TYPE, "decimal128"),
+    ("base_27", MONEY_SQL_TYPE, "decimal128"),
+    ("vat_27", MONEY_SQL_TYPE, "decimal128"),
+    ("base_5", MONEY_SQL_TYPE, "decimal128"),
+    ("vat_5", MONEY_SQL_TYPE, "decimal128"),
+    ("base_25", MONEY_SQL_TYPE, "decimal128"),
+    ("vat_25", MONEY_SQL_TYPE, "decimal128"),
+    ("not_taxed", MONEY_SQL_TYPE, "decimal128"),
+    ("vat_per", MONEY_SQL_TYPE, "decimal128"),
+    ("perc_iibb", MONEY_SQL_TYPE, "decimal128"),
+    ("perc_earnings", MONEY_SQL_TYPE, "decimal128"),
+    ("city_tax", MONEY_SQL_TYPE, "decimal128"),
+    ("other_taxes", MONEY_SQL_TYPE, "decimal128"),
+    ("total", MONEY_SQL_TYPE, "decimal128"),
+)
+
 
 class AccountArVatLine(models.Model):
     _inherit = "account.ar.vat.line"
@@ -13,6 +70,16 @@ class AccountArVatLine(models.Model):
         "For all other invoices, this is the same as the accounting date.",
     )
 
+    @property
+    def _table_query(self):
+        """Read the VAT lines from their query instead of the SQL view.
+
+        The view created by ``init()`` aggregates every move of the database;
+        building the query per request lets the computation date bounds of
+        ``_read_group`` be applied before the aggregation.
+        """
+        return self._ar_vat_line_build_query()
+
     @api.model
     def _ar_vat_line_build_query(
         self,
@@ -42,6 +109,24 @@ class AccountArVatLine(models.Model):
 
         search_condition = base_search_condition
 
+        # Computation date bounds pushed down by _read_group, applied before
+        # the per move aggregation instead of on the whole view
+        date_bounds = self.env.context.get("l10n_ar_vat_computation_date_bounds")
+        if date_bounds:
+            search_condition = SQL(
+                "%s AND %s",
+                search_condition,
+                SQL(" AND ").join(
+                    SQL(
+                        "COALESCE(account_move.l10n_ar_vat_computation_date, "
+                        "account_move.date) %s %s",
+                        SQL(operator),
+                        value,
+                    )
+                    for operator, value in date_bounds
+                ),
+            )
+
         # This is the same query as the parent, but with vat_computation_date added
         query = SQL(
             """
@@ -190,3 +275,209 @@ class AccountArVatLine(models.Model):
             search_condition=search_condition,
         )
         return query
+
+    @api.model
+    def _read_group(
+        self,
+        domain,
+        groupby=(),
+        aggregates=(),
+        having=(),
+        offset=0,
+        limit=None,
+        order=None,
+    ):
+        """Override to filter the VAT line view on the computation date early.
+
+        Pivot and graph views filter on vat_computation_date (e.g. "VAT Comp:
+        Current Month"). Those bounds are also applied inside the table query,
+        so only the moves of the period are aggregated. The outer domain is
+        kept unchanged, so the result is the same.
+        """
+        date_bounds = self._get_vat_computation_date_bounds(domain)
+        model = self
+        if date_bounds:
+            model = self.with_context(l10n_ar_vat_computation_date_bounds=date_bounds)
+        return super(AccountArVatLine, model)._read_group(
+            domain,
+            groupby=groupby,
+            aggregates=aggregates,
+            having=having,
+            offset=offset,
+            limit=limit,
+            order=order,
+        )
+
+    @api.model
+    def _get_vat_computation_date_bounds(self, domain):
+        """Return the (operator, value) bounds on vat_computation_date.
+
+        Bounds are only extracted from conjunctive domains, where each of them
+        restricts the whole result.
+        """
+        if not domain or any(item in ("|", "!") for item in domain):
+            return []
+        return [
+            (leaf[1], leaf[2])
+            for leaf in domain
+            if isinstance(leaf, (list, tuple))
+            and len(leaf) == 3
+            and leaf[0] == "vat_computation_date"
+            and leaf[1] in ("=", "<", "<=", ">", ">=")
+            and leaf[2]
+        ]
+
+    @api.model
+    def _ar_vat_line_iter_batches(self, query, batch_size=10000):
+        """Yield the rows of ``query`` by batches from a server-side cursor.
+
+        Only ``batch_size`` rows are held in memory at a time, whatever the
+        size of the result.
+
+        :return: generator of (column names, list of row tuples)
+        """
+        self.env.flush_all()
+        cr = self.env.cr
+        cursor_name = SQL.identifier(f"l10n_ar_vat_lines_{uuid.uuid4().hex}")
+        cr.execute(SQL("DECLARE %s NO SCROLL CURSOR FOR %s", cursor_name, query))
+        try:
+            while True:
+                cr.execute(SQL("FETCH FORWARD %s FROM %s", batch_size, cursor_name))
+                rows = cr.fetchall()
+                if not rows:
+                    break
+                yield [column.name for column in cr.description], rows
+        finally:
+            cr.execute(SQL("CLOSE %s", cursor_name))
+
+    @api.model
+    def export_columnar(
+        self,
+        date_from,
+        date_to,
+        company_ids=None,
+        partition_by=(),
+        batch_size=10000,
+    ):
+        """Export posted VAT lines to Parquet files stored as attachments.
+
+        Rows are streamed from the VAT line query and written by batches, so
+        a year of data never has to be loaded at once nor serialized as dicts.
+
+        :param date_from: first VAT computation date to export
+        :param date_to: last VAT computation date to export
+        :param company_ids: companies to export, among the allowed companies of
+            the user; defaults to the current one
+        :param partition_by: any of ``"period"`` (VAT computation month) and
+            ``"company"``; one file is written per partition
+        :return: ids of the created ``ir.attachment`` records
+        """
+        if pyarrow is None:
+            raise UserError(
+                _("The pyarrow Python library is required for the columnar export.")
+            )
+        unknown = set(partition_by) - {"period", "company"}
+        if unknown:
+            raise UserError(
+                _("Unknown partitions: %(partitions)s", partitions=", ".join(unknown))
+            )
+        company_ids = company_ids or self.env.company.ids
+        # The query below is raw SQL and bypasses record rules, so restrict it
+        # to the companies the user is allowed to work on
+        forbidden = set(company_ids) - set(self.env.companies.ids)
+        if forbidden:
+            raise AccessError(
+                _(
+                    "You cannot export VAT lines of companies you do not have "
+                    "access to: %(companies)s",
+                    companies=", ".join(
+                        self.env["res.company"].sudo().browse(forbidden).mapped("name")
+                    ),
+                )
+            )
+
+        # The date bounds are applied before the per move aggregation
+        vat_lines = self.with_context(
+            l10n_ar_vat_computation_date_bounds=[
+                (">=", date_from),
+                ("<=", date_to),
+            ]
+        )._ar_vat_line_build_query(
+            search_condition=SQL(
+                "account_move.company_id IN %s AND account_move.state = 'posted'",
+                tuple(company_ids),
+            ),
+        )
+        query = SQL(
+            "SELECT %s FROM (%s) vat",
+            SQL(", ").join(
+                SQL("vat.%s::%s", SQL.identifier(name), SQL(sql_type))
+                for name, sql_type, __ in COLUMNAR_COLUMNS
+            ),
+            vat_lines,
+        )
+        schema = pyarrow.schema(
+            [
+                (
+                    name,
+                    getattr(pyarrow, arrow_type)(*ARROW_TYPE_ARGS.get(arrow_type, ())),
+                )
+                for name, __, arrow_type in COLUMNAR_COLUMNS
+            ]
+        )
+        names = [name for name, __, __ in COLUMNAR_COLUMNS]
+        period_index = names.index("vat_computation_date")
+        company_index = names.index("company_id")
+
+        def partition_key(row):
+            period = row[period_index].strftime("%Y-%m")
+            return (
+                period if "period" in partition_by else None,
+                row[company_index] if "company" in partition_by else None,
+            )
+
+        # Each partition is written to a file of a temporary directory rather
+        # than kept in memory, and only read back to be stored as attachment
+        writers = {}
+        attachments = self.env["ir.attachment"]
+        with tempfile.TemporaryDirectory() as directory:
+            for __, rows in self._ar_vat_line_iter_batches(query, batch_size):
+                partitions = {}
+                for row in rows:
+                    partitions.setdefault(partition_key(row), []).append(row)
+                for key, partition_rows in partitions.items():
+                    if key not in writers:
+                        path = os.path.join(directory, f"{len(writers)}.parquet")
+                        writers[key] = (
+                            path,
+                            pyarrow.parquet.ParquetWriter(path, schema),
+                        )
+                    columns = list(zip(*partition_rows, strict=True))
+                    writers[key][1].write_table(
+                        pyarrow.table(
+                            {name: columns[index] for index, name in enumerate(names)},
+                            schema=schema,
+                        )
+                    )
+
+            for (period, company_id), (path, writer) in sorted(
+                writers.items(), key=lambda item: tuple(map(str, item[0]))
+            ):
+                writer.close()
+                suffix = "".join(
+                    part
+                    for part in (
+                        period and f"_{period}",
+                        company_id and f"_company{company_id}",
+                    )
+                    if part
+                )
+                with open(path, "rb") as parquet_file:
+                    attachments |= attachments.create(
+                        {
+                            "name": f"vat_lines{suffix}.parquet",
+                            "raw": parquet_file.read(),
+                            "mimetype": "application/vnd.apache.parquet",
+                        }
+                    )
+        return attachments.ids
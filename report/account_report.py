@@ -0,0 +1,31 @@
+from odoo import models
+
+
+class AccountReport(models.Model):
+    _inherit = "account.report"
+
+    def export_to_xlsx(self, options, response=None):
+        """Override to fingerprint the exported Argentinian VAT book."""
+        fingerprint = {}
+        report = self.with_context(l10n_ar_vat_book_fingerprint=fingerprint)
+        res = super(AccountReport, report).export_to_xlsx(options, response=response)
+        self._l10n_ar_vat_book_store_snapshot(options, fingerprint)
+        return res
+
+    def export_to_pdf(self, options):
+        """Override to fingerprint the exported Argentinian VAT book."""
+        fingerprint = {}
+        report = self.with_context(l10n_ar_vat_book_fingerprint=fingerprint)
+        res = super(AccountReport, report).export_to_pdf(options)
+        self._l10n_ar_vat_book_store_snapshot(options, fingerprint)
+        return res
+
+    def _l10n_ar_vat_book_store_snapshot(self, options, fingerprint):
+        """Store a snapshot when the report is handled by the VAT book handler.
+
+        The fingerprint is collected while the exported lines are generated,
+        so the book is not queried a second time.
+        """
+        handler_name = self._get_custom_handler_model()
+        if handler_name and hasattr(self.env[handler_name], "_vat_book_store_snapshot"):
+            self.env[handler_name]._vat_book_store_snapshot(self, options, fingerprint)
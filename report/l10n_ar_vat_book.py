@@ -1,5 +1,24 @@
-from odoo import api, models
-from odoo.tools import SQL
+import logging
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import lru_cache
+
+import psycopg2
+
+from odoo import _, api, models
+from odoo.api import Environment, Transaction
+from odoo.tools import SQL, config, str2bool
+
+_logger = logging.getLogger(__name__)
+
+REPLICA_PARAM = "l10n_ar_vat_computation_date.report_use_replica"
+REPLICA_MAX_LAG_PARAM = "l10n_ar_vat_computation_date.report_replica_max_lag"
+
+
+@lru_cache
+def _vat_book_row_type(columns):
+    """Return the named tuple type of the VAT book rows with these columns."""
+    return namedtuple("VatBookRow", columns)
 
 
 class ArgentinianReportCustomHandler(models.AbstractModel):
@@ -16,8 +35,185 @@ class ArgentinianReportCustomHandler(models.AbstractModel):
             options["_original_date_from"] = options["date"].get("date_from")
             options["_original_date_to"] = options["date"].get("date_to")
 
+        # Offer background rendering for large, deferral-heavy periods
+        options.setdefault("buttons", []).extend(
+            [
+                {
+                    "name": _("XLSX (background)"),
+                    "sequence": 35,
+                    "action": "action_export_vat_book_background",
+                    "action_param": "xlsx",
+                },
+                {
+                    "name": _("PDF (background)"),
+                    "sequence": 36,
+                    "action": "action_export_vat_book_background",
+                    "action_param": "pdf",
+                },
+            ]
+        )
+
         return result
 
+    def action_export_vat_book_background(self, options, file_format="xlsx"):
+        """Queue the rendering of the VAT book instead of blocking the worker."""
+        report = self.env["account.report"].browse(options["report_id"])
+        self.env["l10n_ar.vat.book.export"]._enqueue(report, options, file_format)
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "type": "info",
+                "message": _(
+                    "The VAT book is being exported in the background. You will "
+                    "be notified when the files are ready."
+                ),
+            },
+        }
+
+    @contextmanager
+    def _l10n_ar_vat_report_env(self):
+        """Yield the environment read-only report queries should run in.
+
+        When enabled, the queries run on a read-only cursor of the replica
+        configured for Odoo (``db_replica_host``/``db_replica_port``);
+        otherwise the current environment is used.
+        """
+        cr = self._l10n_ar_vat_replica_cursor()
+        if cr is None:
+            yield self.env
+            return
+        try:
+            cr.transaction = Transaction(self.env.registry)
+            yield Environment(cr, self.env.uid, self.env.context, su=self.env.su)
+        finally:
+            cr.close()
+
+    def _l10n_ar_vat_replica_cursor(self):
+        """Return a read-only cursor on the replica, or None to use the primary.
+
+        The cursor comes from the registry's read-only pool, which Odoo binds
+        to the replica, so no connection settings are kept in the database.
+        None is returned when the routing is disabled, no replica is
+        configured, the replica cannot be queried or its replication lag is
+        above the configured maximum.
+        """
+        params = self.env["ir.config_parameter"].sudo()
+        if config["db_replica_host"] is False or not str2bool(
+            params.get_param(REPLICA_PARAM, "False")
+        ):
+            return None
+
+        max_lag = int(params.get_param(REPLICA_MAX_LAG_PARAM, 60))
+        cr = None
+        try:
+            cr = self.env.registry.cursor(readonly=True)
+            cr.execute("SET TRANSACTION READ ONLY")
+            # Zero on a primary or on a replica that replayed all it received
+            cr.execute(
+                """
+                SELECT CASE
+                    WHEN NOT pg_is_in_recovery()
+                      OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+                    THEN 0
+                    ELSE COALESCE(
+                        EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()),
+                        0
+                    )
+                END
+                """
+            )
+            lag = cr.fetchone()[0]
+        except psycopg2.Error:
+            _logger.warning(
+                "VAT report replica unavailable, using the primary", exc_info=True
+            )
+            if cr is not None:
+                cr.close()
+            return None
+
+        if lag > max_lag:
+            _logger.warning(
+                "VAT report replica lags %.0fs (max %ss), using the primary",
+                lag,
+                max_lag,
+            )
+            cr.close()
+            return None
+        return cr
+
+    def _dynamic_lines_generator(self, report, options, *args, **kwargs):
+        """Override to run the VAT book queries on the replica when configured.
+
+        When the context holds a ``l10n_ar_vat_book_fingerprint`` dict, the
+        hashes of the generated lines are added to it, so exports fingerprint
+        the book from the lines they rendered instead of querying it again.
+        """
+        with self._l10n_ar_vat_report_env() as env:
+            lines = list(
+                super(
+                    ArgentinianReportCustomHandler, self.with_env(env)
+                )._dynamic_lines_generator(
+                    report.with_env(env), options, *args, **kwargs
+                )
+            )
+        fingerprint = self.env.context.get("l10n_ar_vat_book_fingerprint")
+        if fingerprint is not None:
+            fingerprint.update(self._vat_book_fingerprint_lines(report, lines))
+        return lines
+
+    def _vat_book_fingerprint_lines(self, report, lines):
+        """Hash the column values of the move lines of the VAT book.
+
+        :return: dict mapping ``<move_id>-<column_group_key>`` to the hash of
+            the values of that move in that column group
+        """
+        values = {}
+        for _sequence, line in lines:
+            model, move_id = report._get_model_info_from_id(line["id"])
+            if model != "account.move":
+                continue
+            for column in line.get("columns", []):
+                key = f"{move_id}-{column.get('column_group_key')}"
+                values.setdefault(key, []).append(column.get("no_format"))
+        snapshots = self.env["l10n_ar.vat.book.snapshot"]
+        return {key: snapshots._hash_values(vals) for key, vals in values.items()}
+
+    def _vat_book_fingerprint(self, report, options):
+        """Return the fingerprint of the VAT book currently generated by options."""
+        fingerprint = {}
+        report.with_context(l10n_ar_vat_book_fingerprint=fingerprint)._get_lines(
+            options
+        )
+        return fingerprint
+
+    def _vat_book_iter_rows(self, report, options, batch_size=1000):
+        """Yield the VAT book rows of the report options as named tuples.
+
+        This is the entry point for integrations writing the VAT book
+        elsewhere (Libro IVA Digital, audit extracts). Rows are fetched by
+        ``batch_size`` from a server-side cursor on the same query as the
+        report, so memory use does not depend on the size of the period.
+        Each row is a ``VatBookRow`` named tuple whose fields are the columns
+        of the query (``move_id``, ``vat_computation_date``, ``vat_21``...),
+        with one set of rows per column group of the options.
+        """
+        with self._l10n_ar_vat_report_env() as env:
+            handler = self.with_env(env)
+            report = report.with_env(env)
+            vat_lines = env["account.ar.vat.line"]
+            for column_group_key, column_group_options in (
+                report._split_options_per_column_group(options).items()
+            ):
+                query = handler._build_query(
+                    report, column_group_options, column_group_key
+                )
+                for columns, rows in vat_lines._ar_vat_line_iter_batches(
+                    query, batch_size
+                ):
+                    row_type = _vat_book_row_type(tuple(columns))
+                    yield from map(row_type._make, rows)
+
     def _build_query(self, report, options, column_group_key) -> SQL:
         """Override to use vat_computation_date for AR purchases.
 
@@ -91,6 +287,50 @@ class ArgentinianReportCustomHandler(models.AbstractModel):
             query.from_clause, enhanced_where, column_group_key, tax_types
         )
 
+    def _vat_book_get_period(self, options):
+        """Return the (date_from, date_to) selected before options were widened."""
+        date_from = options.get("_original_date_from") or options.get("date", {}).get(
+            "date_from"
+        )
+        date_to = options.get("_original_date_to") or options.get("date", {}).get(
+            "date_to"
+        )
+        return date_from, date_to
+
+    def _vat_book_store_snapshot(self, report, options, fingerprint):
+        """Store the fingerprint of the VAT book exported with these options."""
+        date_from, date_to = self._vat_book_get_period(options)
+        return self.env["l10n_ar.vat.book.snapshot"]._take(
+            report,
+            options,
+            date_from,
+            date_to,
+            self._vat_book_get_selected_tax_types(options),
+            fingerprint,
+        )
+
+    def _vat_book_get_delta(self, options, snapshot=None):
+        """Return the rows added, removed or changed since the last export.
+
+        When no snapshot is given, the most recent one of the same company,
+        period and tax types is used. Returns None if the period was never
+        exported.
+        """
+        if snapshot is None:
+            date_from, date_to = self._vat_book_get_period(options)
+            tax_types = sorted(self._vat_book_get_selected_tax_types(options))
+            snapshot = self.env["l10n_ar.vat.book.snapshot"].search(
+                [
+                    ("company_id", "=", self.env.company.id),
+                    ("report_id", "=", options["report_id"]),
+                    ("date_from", "=", date_from),
+                    ("date_to", "=", date_to),
+                    ("tax_types", "=", ",".join(tax_types)),
+                ],
+                limit=1,
+            )
+        return snapshot._get_delta() if snapshot else None
+
     @api.model
     def _vat_book_get_lines_domain(self, options):
         """Override to filter purchase invoices by l10n_ar_vat_computation_date.
@@ -174,17 +414,13 @@ class ArgentinianReportCustomHandler(models.AbstractModel):
                     # AR purchase with vat_computation_date
                     "&",
                     "&",
-                    "&",
-                    ("move_type", "in", ["in_invoice", "in_refund"]),
-                    ("country_code", "=", "AR"),
+                    ("l10n_ar_is_purchase_move", "=", True),
                     ("l10n_ar_vat_computation_date", "!=", False),
                     ("l10n_ar_vat_computation_date", ">=", date_from),
                     # All other invoices (NOT(AR purchase with vat_computation_date))
                     "&",
                     "|",
-                    "|",
-                    ("move_type", "not in", ["in_invoice", "in_refund"]),
-                    ("country_code", "!=", "AR"),
+                    ("l10n_ar_is_purchase_move", "=", False),
                     ("l10n_ar_vat_computation_date", "=", False),
                     ("date", ">=", date_from),
                 ]
@@ -197,17 +433,13 @@ class ArgentinianReportCustomHandler(models.AbstractModel):
                     # AR purchase with vat_computation_date
                     "&",
                     "&",
-                    "&",
-                    ("move_type", "in", ["in_invoice", "in_refund"]),
-                    ("country_code", "=", "AR"),
+                    ("l10n_ar_is_purchase_move", "=", True),
                     ("l10n_ar_vat_computation_date", "!=", False),
                     ("l10n_ar_vat_computation_date", "<=", date_to),
                     # All other invoices (NOT(AR purchase with vat_computation_date))
                     "&",
                     "|",
-                    "|",
-                    ("move_type", "not in", ["in_invoice", "in_refund"]),
-                    ("country_code", "!=", "AR"),
+                    ("l10n_ar_is_purchase_move", "=", False),
                     ("l10n_ar_vat_computation_date", "=", False),
                     ("date", "<=", date_to),
                 ]
@@ -238,7 +470,10 @@ class ArgentinianReportCustomHandler(models.AbstractModel):
         _logger = logging.getLogger(__name__)
 
         # Call parent to get the domain and search
-        result = super()._vat_simple_get_csv_move_ids(options, file_type)
+        with self._l10n_ar_vat_report_env() as env:
+            result = super(
+                ArgentinianReportCustomHandler, self.with_env(env)
+            )._vat_simple_get_csv_move_ids(options, file_type)
 
         _logger.warning("=== VAT SIMPLE CSV MOVE IDS DEBUG ===")
         _logger.warning(f"File type: {file_type}")
@@ -268,7 +503,10 @@ class ArgentinianReportCustomHandler(models.AbstractModel):
         _logger.warning(f"Move IDs received: {move_ids}")
 
         # Call parent
-        result = super()._vat_simple_build_purchase_query(file_type, move_ids)
+        with self._l10n_ar_vat_report_env() as env:
+            result = super(
+                ArgentinianReportCustomHandler, self.with_env(env)
+            )._vat_simple_build_purchase_query(file_type, move_ids)
 
         _logger.warning(f"Query returned {len(result)} rows")
         for i, row in enumerate(result[:5]):
@@ -292,8 +530,8 @@ class ArgentinianReportCustomHandler(models.AbstractModel):
     def _build_purchase_date_domain(self, date_from, date_to):
         """Build date domain for purchases only, using vat_computation_date.
 
-        Note: Uses company's country instead of country_code which doesn't
-        exist in Odoo 18.
+        Note: AR purchases are identified by the stored
+        l10n_ar_is_purchase_move flag.
         """
         domain = []
 
@@ -304,13 +542,13 @@ class ArgentinianReportCustomHandler(models.AbstractModel):
                     # AR purchase with vat_computation_date
                     "&",
                     "&",
-                    ("move_type", "in", ["in_invoice", "in_refund"]),
+                    ("l10n_ar_is_purchase_move", "=", True),
                     ("l10n_ar_vat_computation_date", "!=", False),
                     ("l10n_ar_vat_computation_date", ">=", date_from),
                     # Other invoices or without vat_computation_date
                     "&",
                     "|",
-                    ("move_type", "not in", ["in_invoice", "in_refund"]),
+                    ("l10n_ar_is_purchase_move", "=", False),
                     ("l10n_ar_vat_computation_date", "=", False),
                     ("date", ">=", date_from),
                 ]
@@ -323,13 +561,13 @@ class ArgentinianReportCustomHandler(models.AbstractModel):
                     # AR purchase with vat_computation_date
                     "&",
                     "&",
-                    ("move_type", "in", ["in_invoice", "in_refund"]),
+                    ("l10n_ar_is_purchase_move", "=", True),
                     ("l10n_ar_vat_computation_date", "!=", False),
                     ("l10n_ar_vat_computation_date", "<=", date_to),
                     # Other invoices or without vat_computation_date
                     "&",
                     "|",
-                    ("move_type", "not in", ["in_invoice", "in_refund"]),
+                    ("l10n_ar_is_purchase_move", "=", False),
                     ("l10n_ar_vat_computation_date", "=", False),
                     ("date", "<=", date_to),
                 ]
@@ -345,8 +583,8 @@ class ArgentinianReportCustomHandler(models.AbstractModel):
           vat_computation_date
         - All others: filter by date
 
-        Note: We check for l10n_ar_vat_computation_date presence to identify
-        AR purchases since country_code doesn't exist in Odoo 18.
+        Note: AR purchases are identified by the stored
+        l10n_ar_is_purchase_move flag.
         """
         domain = []
 
@@ -357,13 +595,13 @@ class ArgentinianReportCustomHandler(models.AbstractModel):
                     # AR purchase invoices with vat_computation_date
                     "&",
                     "&",
-                    ("move_type", "in", ["in_invoice", "in_refund"]),
+                    ("l10n_ar_is_purchase_move", "=", True),
                     ("l10n_ar_vat_computation_date", "!=", False),
                     ("l10n_ar_vat_computation_date", ">=", date_from),
                     # All other invoices
                     "&",
                     "|",
-                    ("move_type", "not in", ["in_invoice", "in_refund"]),
+                    ("l10n_ar_is_purchase_move", "=", False),
                     ("l10n_ar_vat_computation_date", "=", False),
                     ("date", ">=", date_from),
                 ]
@@ -376,13 +614,13 @@ class ArgentinianReportCustomHandler(models.AbstractModel):
                     # AR purchase invoices with vat_computation_date
                     "&",
                     "&",
-                    ("move_type", "in", ["in_invoice", "in_refund"]),
+                    ("l10n_ar_is_purchase_move", "=", True),
                     ("l10n_ar_vat_computation_date", "!=", False),
                     ("l10n_ar_vat_computation_date", "<=", date_to),
                     # All other invoices
                     "&",
                     "|",
-                    ("move_type", "not in", ["in_invoice", "in_refund"]),
+                    ("l10n_ar_is_purchase_move", "=", False),
                     ("l10n_ar_vat_computation_date", "=", False),
                     ("date", "<=", date_to),
                 ]
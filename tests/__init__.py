@@ -0,0 +1,3 @@
+from . import test_wide_invoices
+from . import test_report_replica
+from . import test_vat_line_read_group
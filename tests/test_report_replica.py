@@ -0,0 +1,107 @@
+from unittest.mock import MagicMock, patch
+
+import psycopg2
+
+from odoo.sql_db import Cursor
+from odoo.tests import TransactionCase, tagged
+from odoo.tools import config
+
+from odoo.addons.l10n_ar_vat_computation_date.report.l10n_ar_vat_book import (
+    REPLICA_MAX_LAG_PARAM,
+    REPLICA_PARAM,
+)
+
+LOGGER = "odoo.addons.l10n_ar_vat_computation_date.report.l10n_ar_vat_book"
+
+
+@tagged("post_install", "-at_install")
+class TestReportReplica(TransactionCase):
+    """Routing of the VAT report queries to the read replica and fallbacks."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.handler = cls.env["l10n_ar.tax.report.handler"]
+        params = cls.env["ir.config_parameter"].sudo()
+        params.set_param(REPLICA_PARAM, "True")
+        params.set_param(REPLICA_MAX_LAG_PARAM, "60")
+
+    def _replica_cursor(self, lag=0.0, failing_statement=None):
+        """Return a fake replica cursor reporting ``lag`` seconds of lag.
+
+        :param failing_statement: first word of the statement that raises a
+            database error, e.g. ``"SET"`` or ``"SELECT"``
+        """
+        cr = MagicMock(spec=Cursor)
+
+        def execute(query, *args, **kwargs):
+            if failing_statement and query.split()[0] == failing_statement:
+                raise psycopg2.ProgrammingError("permission denied")
+
+        cr.execute.side_effect = execute
+        cr.fetchone = MagicMock(return_value=(lag,))
+        return cr
+
+    def _patch_replica(self, **cursor_kwargs):
+        """Configure a replica host and make the registry serve ``cursor``."""
+        return (
+            patch.dict(config.options, {"db_replica_host": "replica"}),
+            patch.object(self.env.registry, "cursor", **cursor_kwargs),
+        )
+
+    def test_up_to_date_replica_is_used(self):
+        replica_cr = self._replica_cursor(lag=5.0)
+        config_patch, cursor_patch = self._patch_replica(return_value=replica_cr)
+        with config_patch, cursor_patch as cursor:
+            with self.handler._l10n_ar_vat_report_env() as env:
+                self.assertIs(env.cr, replica_cr)
+                self.assertEqual(env.uid, self.env.uid)
+        cursor.assert_called_once_with(readonly=True)
+        replica_cr.close.assert_called_once()
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        replica_cr = self._replica_cursor(lag=120.0)
+        config_patch, cursor_patch = self._patch_replica(return_value=replica_cr)
+        with config_patch, cursor_patch, self.assertLogs(LOGGER, "WARNING") as logs:
+            with self.handler._l10n_ar_vat_report_env() as env:
+                self.assertIs(env, self.env)
+        self.assertIn("lags", logs.output[0])
+        replica_cr.close.assert_called_once()
+
+    def test_unreachable_replica_falls_back_to_primary(self):
+        config_patch, cursor_patch = self._patch_replica(
+            side_effect=psycopg2.OperationalError("connection refused")
+        )
+        with config_patch, cursor_patch, self.assertLogs(LOGGER, "WARNING") as logs:
+            with self.handler._l10n_ar_vat_report_env() as env:
+                self.assertIs(env, self.env)
+        self.assertIn("unavailable", logs.output[0])
+
+    def test_failing_replica_statements_fall_back_to_primary(self):
+        for statement in ("SET", "SELECT"):
+            with self.subTest(statement=statement):
+                replica_cr = self._replica_cursor(failing_statement=statement)
+                config_patch, cursor_patch = self._patch_replica(
+                    return_value=replica_cr
+                )
+                with config_patch, cursor_patch, self.assertLogs(LOGGER, "WARNING"):
+                    with self.handler._l10n_ar_vat_report_env() as env:
+                        self.assertIs(env, self.env)
+                replica_cr.close.assert_called_once()
+
+    def test_disabled_routing_uses_primary(self):
+        self.env["ir.config_parameter"].sudo().set_param(REPLICA_PARAM, "False")
+        config_patch, cursor_patch = self._patch_replica()
+        with config_patch, cursor_patch as cursor:
+            with self.handler._l10n_ar_vat_report_env() as env:
+                self.assertIs(env, self.env)
+        cursor.assert_not_called()
+
+    def test_no_replica_configured_uses_primary(self):
+        with (
+            patch.dict(config.options, {"db_replica_host": False}),
+            patch.object(self.env.registry, "cursor") as cursor,
+        ):
+            with self.handler._l10n_ar_vat_report_env() as env:
+                self.assertIs(env, self.env)
+        cursor.assert_not_called()
@@ -0,0 +1,86 @@
+from unittest.mock import patch
+
+from odoo import Command
+from odoo.sql_db import Cursor
+from odoo.tests import tagged
+from odoo.tools import SQL
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+
+# Condition added inside the VAT line query by the computation date bounds
+PUSHED_DOWN_BOUND = (
+    "COALESCE(account_move.l10n_ar_vat_computation_date, account_move.date) >= %s"
+)
+
+
+@tagged("post_install", "-at_install")
+class TestVatLineReadGroup(AccountTestInvoicingCommon):
+    """Computation date filters of the VAT line views reach the query."""
+
+    @classmethod
+    @AccountTestInvoicingCommon.setup_chart_template("ar_ri")
+    def setUpClass(cls):
+        super().setUpClass()
+        journal = cls.env["account.journal"].create(
+            {
+                "name": "Vendor Bills Without Documents",
+                "code": "VBND",
+                "type": "purchase",
+                "l10n_latam_use_documents": False,
+            }
+        )
+        for invoice_date in ("2025-01-15", "2025-03-15"):
+            cls.env["account.move"].create(
+                {
+                    "move_type": "in_invoice",
+                    "journal_id": journal.id,
+                    "partner_id": cls.partner_a.id,
+                    "invoice_date": invoice_date,
+                    "invoice_line_ids": [
+                        Command.create(
+                            {
+                                "name": "Line",
+                                "price_unit": 100.0,
+                                "tax_ids": [
+                                    Command.set(
+                                        cls.company_data["default_tax_purchase"].ids
+                                    )
+                                ],
+                            }
+                        )
+                    ],
+                }
+            ).action_post()
+
+    def _read_group_queries(self, domain):
+        """Return the result of a read_group on ``domain`` and its queries."""
+        queries = []
+        execute = Cursor.execute
+
+        def recording_execute(cr, query, *args, **kwargs):
+            queries.append(query.code if isinstance(query, SQL) else str(query))
+            return execute(cr, query, *args, **kwargs)
+
+        with patch.object(Cursor, "execute", recording_execute):
+            groups = self.env["account.ar.vat.line"]._read_group(
+                domain, ["move_id"], ["__count"]
+            )
+        return groups, queries
+
+    def test_read_group_pushes_bounds_into_query(self):
+        groups, queries = self._read_group_queries(
+            [("vat_computation_date", ">=", "2025-03-01")]
+        )
+        vat_line_queries = [query for query in queries if "tax_lines" in query]
+        self.assertEqual(len(vat_line_queries), 1)
+        self.assertIn(PUSHED_DOWN_BOUND, vat_line_queries[0])
+        self.assertEqual(
+            [move.invoice_date.isoformat() for move, __ in groups], ["2025-03-15"]
+        )
+
+    def test_read_group_without_bounds(self):
+        groups, queries = self._read_group_queries([])
+        vat_line_queries = [query for query in queries if "tax_lines" in query]
+        self.assertEqual(len(vat_line_queries), 1)
+        self.assertNotIn(PUSHED_DOWN_BOUND, vat_line_queries[0])
+        self.assertEqual(len(groups), 2)
@@ -0,0 +1,191 @@
+from contextlib import contextmanager
+from unittest.mock import patch
+
+from odoo import Command
+from odoo.tests import tagged
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+
+
+@tagged("post_install", "-at_install")
+class TestWideInvoices(AccountTestInvoicingCommon):
+    """Query counts of the deferral stages of posting do not grow with lines."""
+
+    # Stages of AccountMove._post whose query count must not depend on the
+    # number of lines of the invoices
+    CHECKED_STAGES = ("vat_account_swap", "adjustment_entries")
+
+    @classmethod
+    @AccountTestInvoicingCommon.setup_chart_template("ar_ri")
+    def setUpClass(cls):
+        super().setUpClass()
+        company = cls.company_data["company"]
+        cls.vat_credit_account = cls.env["account.account"].create(
+            {
+                "name": "VAT Credit",
+                "code": "VATC01",
+                "account_type": "asset_current",
+            }
+        )
+        cls.vat_to_compute_account = cls.env["account.account"].create(
+            {
+                "name": "VAT Credit To Compute",
+                "code": "VATC02",
+                "account_type": "asset_current",
+            }
+        )
+        cls.tax = cls.company_data["default_tax_purchase"]
+        tax_repartition_lines = (
+            cls.tax.invoice_repartition_line_ids | cls.tax.refund_repartition_line_ids
+        ).filtered(lambda line: line.repartition_type == "tax")
+        tax_repartition_lines.account_id = cls.vat_credit_account
+        cls.journal = cls.env["account.journal"].create(
+            {
+                "name": "Vendor Bills Without Documents",
+                "code": "VBND",
+                "type": "purchase",
+                "l10n_latam_use_documents": False,
+            }
+        )
+        cls.env["account.journal"].create(
+            {"name": "VAT Adjustments", "code": "AJIVA", "type": "general"}
+        )
+        company.write(
+            {
+                "l10n_ar_vat_credit_account_id": cls.vat_credit_account.id,
+                "l10n_ar_vat_credit_to_compute_account_id": (
+                    cls.vat_to_compute_account.id
+                ),
+                "l10n_ar_vat_post_profiling": True,
+                "l10n_ar_vat_post_slow_threshold": 0.0,
+                "tax_lock_date": "2024-12-31",
+            }
+        )
+
+    def _create_bill(self, line_count):
+        """Create a draft bill dated in the locked tax period."""
+        return self.env["account.move"].create(
+            {
+                "move_type": "in_invoice",
+                "journal_id": self.journal.id,
+                "partner_id": self.partner_a.id,
+                "invoice_date": "2024-12-15",
+                "ref": f"WIDE-{line_count}",
+                "invoice_line_ids": [
+                    Command.create(
+                        {
+                            "name": f"Line {index}",
+                            "price_unit": 100.0,
+                            "tax_ids": [Command.set(self.tax.ids)],
+                        }
+                    )
+                    for index in range(line_count)
+                ],
+            }
+        )
+
+    def _post_bill(self, bill, expected=None):
+        """Post ``bill`` and return the query count of each checked stage.
+
+        :param expected: maximum query count of each checked stage, enforced
+            with assertQueryCount while the stage runs
+        """
+        AccountMove = type(self.env["account.move"])
+        post_stage = AccountMove._l10n_ar_vat_post_stage
+        test = self
+        timings = []
+
+        @contextmanager
+        def checked_post_stage(moves, stage, stage_timings):
+            with post_stage(moves, stage, stage_timings):
+                if expected and stage in expected:
+                    with test.assertQueryCount(expected[stage], flush=False):
+                        yield
+                else:
+                    yield
+
+        def log_post_timings(moves, stage_timings, deferred_moves):
+            timings.extend(stage_timings)
+
+        with (
+            patch.object(AccountMove, "_l10n_ar_vat_post_stage", checked_post_stage),
+            patch.object(
+                AccountMove, "_l10n_ar_vat_log_post_timings", log_post_timings
+            ),
+        ):
+            bill.action_post()
+
+        self.assertEqual(bill.l10n_ar_vat_computation_date.isoformat(), "2025-01-31")
+        self.assertTrue(bill.l10n_ar_vat_adjustment_move_id)
+        return {
+            stage: queries
+            for stage, __, queries in timings
+            if stage in self.CHECKED_STAGES
+        }
+
+    def _post_bill_lock_date_queries(self, bill):
+        """Post ``bill`` and return the query count of the tax lock date check.
+
+        ``_check_tax_lock_date`` runs in the ``post`` stage, which is not
+        checked as a whole since the standard posting grows with the lines.
+        """
+        AccountMoveLine = type(self.env["account.move.line"])
+        check_tax_lock_date = AccountMoveLine._check_tax_lock_date
+        counts = []
+
+        def counted_check_tax_lock_date(lines):
+            start = lines.env.cr.sql_log_count
+            result = check_tax_lock_date(lines)
+            counts.append(lines.env.cr.sql_log_count - start)
+            return result
+
+        with patch.object(
+            AccountMoveLine, "_check_tax_lock_date", counted_check_tax_lock_date
+        ):
+            bill.action_post()
+        self.assertTrue(counts, "The tax lock date was not checked on posting")
+        return sum(counts)
+
+    def test_stage_query_count_independent_of_line_count(self):
+        # Warm up the caches of the posting path
+        self._post_bill(self._create_bill(1))
+
+        reference = self._post_bill(self._create_bill(10))
+        self.assertEqual(set(reference), set(self.CHECKED_STAGES))
+        for line_count in (100, 2000):
+            with self.subTest(line_count=line_count):
+                counts = self._post_bill(self._create_bill(line_count), reference)
+                self.assertEqual(counts, reference)
+
+    def test_wide_bill_adjustment_amount(self):
+        bill = self._create_bill(100)
+        self._post_bill(bill)
+        adjustment = bill.l10n_ar_vat_adjustment_move_id
+        self.assertEqual(adjustment.state, "posted")
+        self.assertRecordValues(
+            adjustment.line_ids.sorted("debit", reverse=True),
+            [
+                {
+                    "account_id": self.vat_credit_account.id,
+                    "debit": bill.amount_tax,
+                    "credit": 0.0,
+                },
+                {
+                    "account_id": self.vat_to_compute_account.id,
+                    "debit": 0.0,
+                    "credit": bill.amount_tax,
+                },
+            ],
+        )
+
+    def test_tax_lock_date_check_query_count_independent_of_line_count(self):
+        # Warm up the caches of the posting path
+        self._post_bill_lock_date_queries(self._create_bill(1))
+
+        reference = self._post_bill_lock_date_queries(self._create_bill(10))
+        for line_count in (100, 2000):
+            with self.subTest(line_count=line_count):
+                self.assertLessEqual(
+                    self._post_bill_lock_date_queries(self._create_bill(line_count)),
+                    reference,
+                )